@@ -7,7 +7,8 @@ This package contains utility classes for managing MCP tools, sessions, and cont
 from .mcp_tools_manager import MCPToolsManager
 from .session_manager import SessionManager
 from .context_manager import ContextManager
+from .shared_context_manager import SharedContextManager
 from .agents import AgentOrchestrator
 from .database import DatabaseManager
 
-__all__ = ['MCPToolsManager', 'SessionManager', 'ContextManager', 'AgentOrchestrator', 'DatabaseManager']
+__all__ = ['MCPToolsManager', 'SessionManager', 'ContextManager', 'SharedContextManager', 'AgentOrchestrator', 'DatabaseManager']
@@ -5,5 +5,7 @@ This package contains agent orchestration and management classes.
 """
 
 from .agent_orchestrator import AgentOrchestrator
+from .history import HistoryAssembler
+from .response_cache import ResponseCache
 
-__all__ = ['AgentOrchestrator']
+__all__ = ['AgentOrchestrator', 'HistoryAssembler', 'ResponseCache']
@@ -1,148 +1,384 @@
-import sqlite3
+import asyncio
 import json
+import os
 from datetime import datetime
+from ..database import DatabaseManager
+from ..metrics import metrics
+from .router import KeywordRouter
+from .semantic_router import SemanticRouter
+
+ROUTING_KEYWORDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'routing_keywords.json')
 
 
 class AgentOrchestrator:
     """Orchestrate multiple agents for different tasks"""
 
-    def __init__(self, mcp_tools, openai_client=None):
+    def __init__(self, mcp_tools, openai_client=None, tool_timeout=10.0, max_tool_concurrency=4,
+                 model="gpt-3.5-turbo", db_manager=None, routing_keywords_path=None,
+                 semantic_routing=False, semantic_threshold=0.35, embed=None, response_cache=None,
+                 async_openai_client=None):
         self.mcp_tools = mcp_tools
+        self.async_client = async_openai_client
+        self.db = db_manager or DatabaseManager.shared()
         self.client = openai_client
+        self.model = model
+        self.response_cache = response_cache
+        self.tool_timeout = tool_timeout
+        self.max_tool_concurrency = max_tool_concurrency
         self.agents = {
             'payment_agent': {
                 'name': 'Payment Processing Agent',
                 'description': 'Handles payment-related queries and transactions',
                 'tools': ['payment_processor', 'balance_checker', 'transaction_history'],
-                'system_prompt': 'You are a payment processing agent for a bus transit system. Help customers with payments, balance inquiries, and transaction history.'
+                'system_prompt': 'You are a payment processing agent for a bus transit system. Help customers with payments, balance inquiries, and transaction history.',
+                # Answers include live balances and transactions, so never reuse them
+                'cache_responses': False
             },
             'offers_agent': {
                 'name': 'Offers & Rewards Agent',
                 'description': 'Manages offers, promotions, and rewards programs',
                 'tools': ['offer_manager', 'rewards_calculator', 'promo_validator'],
-                'system_prompt': 'You are an offers and rewards agent. Help customers find deals, apply promotions, and manage their rewards.'
+                'system_prompt': 'You are an offers and rewards agent. Help customers find deals, apply promotions, and manage their rewards.',
+                # Result cache TTLs (seconds) for read-only tools
+                'tool_cache_ttl': {'offer_manager': 300}
             },
             'bus_schedule_agent': {
                 'name': 'Bus Schedule Agent',
                 'description': 'Provides bus schedules, routes, and timing information',
                 'tools': ['schedule_lookup', 'route_planner', 'real_time_tracking'],
-                'system_prompt': 'You are a bus schedule agent. Provide accurate schedule information, route planning, and real-time updates.'
+                'system_prompt': 'You are a bus schedule agent. Provide accurate schedule information, route planning, and real-time updates.',
+                'tool_cache_ttl': {'schedule_lookup': 60, 'route_planner': 300}
             },
             'support_agent': {
                 'name': 'Customer Support Agent',
                 'description': 'General customer support and issue resolution',
                 'tools': ['ticket_manager', 'faq_search', 'escalation_handler'],
-                'system_prompt': 'You are a general customer support agent. Help with various inquiries and escalate complex issues when needed.'
+                'system_prompt': 'You are a general customer support agent. Help with various inquiries and escalate complex issues when needed.',
+                'tool_cache_ttl': {'faq_search': 3600}
             }
         }
         self._initialize_agents_db()
 
+        # Register result caching for read-only tools; explicit configuration wins
+        for agent in self.agents.values():
+            for tool_name, ttl in agent.get('tool_cache_ttl', {}).items():
+                if tool_name not in self.mcp_tools.cache_policies:
+                    self.mcp_tools.set_cache_policy(tool_name, ttl)
+
+        # Keyword tables are data, so routing can be tuned without code changes
+        with open(routing_keywords_path or ROUTING_KEYWORDS_PATH) as f:
+            routing_keywords = json.load(f)
+        self.router = KeywordRouter(routing_keywords['agents'], routing_keywords['tools'],
+                                    default_agent='support_agent')
+
+        # Optional embedding router; keywords remain the fallback below threshold
+        self.semantic_router = None
+        if semantic_routing:
+            examples = {
+                agent_id: [agent['description']] + routing_keywords.get('examples', {}).get(agent_id, [])
+                for agent_id, agent in self.agents.items()
+            }
+            try:
+                self.semantic_router = SemanticRouter(examples, embed=embed, threshold=semantic_threshold)
+            except ImportError as e:
+                print(f"Warning: Semantic routing unavailable ({e}). Falling back to keyword routing.")
+
     def _initialize_agents_db(self):
         """Initialize agents in database"""
-        conn = sqlite3.connect('chat_sessions.db')
-        cursor = conn.cursor()
-
-        for agent_id, agent_data in self.agents.items():
-            cursor.execute('''
-                INSERT OR REPLACE INTO agents (id, name, description, tools)
+        with self.db.connection() as conn:
+            conn.executemany('''
+                INSERT INTO agents (id, name, description, tools)
                 VALUES (?, ?, ?, ?)
-            ''', (agent_id, agent_data['name'], agent_data['description'],
-                  json.dumps(agent_data['tools'])))
-
-        conn.commit()
-        conn.close()
+                ON CONFLICT (id) DO UPDATE SET
+                    name = excluded.name,
+                    description = excluded.description,
+                    tools = excluded.tools,
+                    status = excluded.status
+            ''', [
+                (agent_id, agent_data['name'], agent_data['description'], json.dumps(agent_data['tools']))
+                for agent_id, agent_data in self.agents.items()
+            ])
 
     def get_appropriate_agent(self, message):
-        """Determine which agent should handle the message using AI"""
-        message_lower = message.lower()
-
-        # Simple keyword-based routing (can be enhanced with ML)
-        if any(word in message_lower for word in ['payment', 'pay', 'card', 'balance', 'transaction', 'refund']):
-            return 'payment_agent'
-        elif any(word in message_lower for word in ['offer', 'discount', 'reward', 'promotion', 'deal', 'points']):
-            return 'offers_agent'
-        elif any(word in message_lower for word in ['schedule', 'bus', 'route', 'time', 'arrival', 'departure']):
-            return 'bus_schedule_agent'
-        else:
-            return 'support_agent'
-
-    def process_with_agent(self, agent_id, message, context=None):
+        """Determine which agent should handle the message"""
+        return self.get_appropriate_agents([message])[0]
+
+    @metrics.timed('routing')
+    def get_appropriate_agents(self, messages):
+        """Determine the agent for each of several messages in one batch"""
+        if self.semantic_router is None:
+            return [self.router.route(message).agent_id for message in messages]
+
+        return [
+            agent_id or self.router.route(message).agent_id
+            for message, (agent_id, _) in zip(messages, self.semantic_router.classify_batch(messages))
+        ]
+
+    def process_with_agent(self, agent_id, message, context=None, history=None):
         """Process message with specific agent using OpenAI and MCP tools"""
         agent = self.agents.get(agent_id)
         if not agent:
             return {"error": "Agent not found"}
 
-        # Determine if tools are needed
-        tools_to_call = self._determine_tools_needed(message, agent['tools'])
-        tool_results = []
-
-        # Call MCP tools if needed
-        for tool_name in tools_to_call:
-            if tool_name in self.mcp_tools.available_tools:
-                # Extract parameters from message and context
-                parameters = self._extract_tool_parameters(message, tool_name, context)
-                result = self.mcp_tools.call_tool(tool_name, parameters)
-                tool_results.append({
-                    'tool': tool_name,
-                    'result': result
-                })
+        tool_results = self._run_tools(agent, message, context)
 
         # Generate AI response with tool results
         try:
             if self.client:  # Check if OpenAI client is available
-                messages = [
-                    {"role": "system", "content": agent['system_prompt']},
-                    {"role": "user", "content": message}
-                ]
-
-                # Add tool results to context if available
-                if tool_results:
-                    tool_context = "Available tool results:\n"
-                    for tool_result in tool_results:
-                        tool_context += f"- {tool_result['tool']}: {tool_result['result']}\n"
-                    messages.append({"role": "system", "content": tool_context})
-
-                response = self.client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=messages,
-                    max_tokens=500
-                )
-
-                ai_response = response.choices[0].message.content
+                request, cache_key, ai_response = self._prepare_completion(agent, message, tool_results, history)
+                if ai_response is None:
+                    with metrics.timer('llm', agent=agent_id):
+                        response = self.client.chat.completions.create(**request)
+                    ai_response = self._store_response(cache_key, response.choices[0].message.content)
             else:
-                # Fallback response when OpenAI client is not available
-                ai_response = f"I'm {agent['name']} and I'm here to help you with your {message}. I can assist with {', '.join(agent['tools'])} and other related tasks."
+                ai_response = self._fallback_response(agent, message)
 
         except Exception as e:
-            ai_response = f"I'm {agent['name']} and I'm here to help, but I'm experiencing technical difficulties. Please try again."
+            ai_response = self._error_response(agent)
+
+        return self._result(agent_id, agent, ai_response, tool_results, context)
+
+    async def process_with_agent_async(self, agent_id, message, context=None, history=None):
+        """Async variant of process_with_agent; runs on the shared MCP pool loop"""
+        agent = self.agents.get(agent_id)
+        if not agent:
+            return {"error": "Agent not found"}
+
+        tool_results = await self._run_tools_async(agent, message, context)
+
+        try:
+            if self.async_client or self.client:
+                request, cache_key, ai_response = self._prepare_completion(agent, message, tool_results, history)
+                if ai_response is None:
+                    with metrics.timer('llm', agent=agent_id):
+                        if self.async_client:
+                            response = await self.async_client.chat.completions.create(**request)
+                        else:
+                            # Without an async client, keep the blocking call off the loop
+                            response = await asyncio.to_thread(self.client.chat.completions.create, **request)
+                    ai_response = self._store_response(cache_key, response.choices[0].message.content)
+            else:
+                ai_response = self._fallback_response(agent, message)
+
+        except Exception as e:
+            ai_response = self._error_response(agent)
+
+        return self._result(agent_id, agent, ai_response, tool_results, context)
+
+    def stream_with_agent(self, agent_id, message, context=None, history=None):
+        """Process message with specific agent, yielding the response token by token
+
+        Yields event dicts: a 'start' event once tools have run, a 'token' event
+        per streamed chunk, and a final 'done' event carrying the full response.
+        """
+        agent = self.agents.get(agent_id)
+        if not agent:
+            yield {"type": "error", "error": "Agent not found"}
+            return
+
+        tool_results = self._run_tools(agent, message, context)
+        yield self._start_event(agent_id, agent, tool_results)
+
+        chunks = []
+        try:
+            if self.client:
+                request, cache_key, cached = self._prepare_completion(agent, message, tool_results, history)
+                if cached is not None:
+                    chunks.append(cached)
+                    yield {"type": "token", "content": cached}
+                else:
+                    # Measures time to the start of the stream
+                    with metrics.timer('llm', agent=agent_id):
+                        stream = self.client.chat.completions.create(**request, stream=True)
+                    for chunk in stream:
+                        token = self._chunk_token(chunk)
+                        if token:
+                            chunks.append(token)
+                            yield {"type": "token", "content": token}
+                    self._store_response(cache_key, ''.join(chunks))
+            else:
+                chunks.append(self._fallback_response(agent, message))
+                yield {"type": "token", "content": chunks[-1]}
+
+        except Exception as e:
+            if not chunks:
+                chunks.append(self._error_response(agent))
+                yield {"type": "token", "content": chunks[-1]}
+
+        yield self._done_event(agent_id, agent, ''.join(chunks), tool_results)
+
+    async def stream_with_agent_async(self, agent_id, message, context=None, history=None):
+        """Async variant of stream_with_agent; runs on the shared MCP pool loop"""
+        agent = self.agents.get(agent_id)
+        if not agent:
+            yield {"type": "error", "error": "Agent not found"}
+            return
 
+        tool_results = await self._run_tools_async(agent, message, context)
+        yield self._start_event(agent_id, agent, tool_results)
+
+        chunks = []
+        try:
+            if self.async_client or self.client:
+                request, cache_key, cached = self._prepare_completion(agent, message, tool_results, history)
+                if cached is not None:
+                    chunks.append(cached)
+                    yield {"type": "token", "content": cached}
+                elif self.async_client:
+                    # Measures time to the start of the stream
+                    with metrics.timer('llm', agent=agent_id):
+                        stream = await self.async_client.chat.completions.create(**request, stream=True)
+                    async for chunk in stream:
+                        token = self._chunk_token(chunk)
+                        if token:
+                            chunks.append(token)
+                            yield {"type": "token", "content": token}
+                    self._store_response(cache_key, ''.join(chunks))
+                else:
+                    # Without an async client, answer in one piece with the blocking call off the loop
+                    with metrics.timer('llm', agent=agent_id):
+                        response = await asyncio.to_thread(self.client.chat.completions.create, **request)
+                    chunks.append(self._store_response(cache_key, response.choices[0].message.content))
+                    yield {"type": "token", "content": chunks[-1]}
+            else:
+                chunks.append(self._fallback_response(agent, message))
+                yield {"type": "token", "content": chunks[-1]}
+
+        except Exception as e:
+            if not chunks:
+                chunks.append(self._error_response(agent))
+                yield {"type": "token", "content": chunks[-1]}
+
+        yield self._done_event(agent_id, agent, ''.join(chunks), tool_results)
+
+    def _prepare_completion(self, agent, message, tool_results, history):
+        """Build the completion request for a turn
+
+        Returns the request arguments, the response cache key (None when
+        caching is off for the agent) and the cached response, if any.
+        """
+        messages = self._build_messages(agent, message, tool_results, history)
+        cache_key = self._response_cache_key(agent, messages)
+        cached = self.response_cache.get(cache_key) if cache_key else None
+        return dict(model=self.model, messages=messages, max_tokens=500), cache_key, cached
+
+    def _store_response(self, cache_key, response):
+        """Cache a completed LLM response under its key and return it"""
+        if cache_key and response:
+            self.response_cache.set(cache_key, response)
+        return response
+
+    @staticmethod
+    def _chunk_token(chunk):
+        """Text carried by one streamed completion chunk, if any"""
+        return chunk.choices[0].delta.content if chunk.choices else None
+
+    @staticmethod
+    def _result(agent_id, agent, response, tool_results, context):
+        """Result of process_with_agent and its async variant"""
         return {
             "agent_id": agent_id,
             "agent_name": agent['name'],
-            "response": ai_response,
+            "response": response,
             "tools_used": agent['tools'],
             "tool_calls": tool_results,
             "context": context or {}
         }
 
-    def _determine_tools_needed(self, message, available_tools):
-        """Determine which tools are needed for the message"""
-        message_lower = message.lower()
-        needed_tools = []
-
-        tool_keywords = {
-            'payment_processor': ['pay', 'payment', 'charge', 'transaction'],
-            'balance_checker': ['balance', 'account', 'money', 'funds'],
-            'schedule_lookup': ['schedule', 'time', 'when', 'arrival', 'departure'],
-            'offer_manager': ['offer', 'deal', 'discount', 'promotion']
+    @staticmethod
+    def _start_event(agent_id, agent, tool_results):
+        return {
+            "type": "start",
+            "agent_id": agent_id,
+            "agent_name": agent['name'],
+            "tools_used": agent['tools'],
+            "tool_calls": tool_results
+        }
+
+    @staticmethod
+    def _done_event(agent_id, agent, response, tool_results):
+        return {
+            "type": "done",
+            "agent_id": agent_id,
+            "agent_name": agent['name'],
+            "response": response,
+            "tools_used": agent['tools'],
+            "tool_calls": tool_results
         }
 
-        for tool in available_tools:
-            if tool in tool_keywords:
-                if any(keyword in message_lower for keyword in tool_keywords[tool]):
-                    needed_tools.append(tool)
+    def _run_tools(self, agent, message, context):
+        """Call the MCP tools the message needs and collect their results"""
+        # Call MCP tools concurrently; results keep the order of the calls
+        calls = self._tool_calls(agent, message, context)
+        results = self.mcp_tools.call_tools(
+            calls, timeout=self.tool_timeout, max_concurrency=self.max_tool_concurrency
+        )
+        return self._pack_tool_results(calls, results)
+
+    async def _run_tools_async(self, agent, message, context):
+        """Async variant of _run_tools; runs on the shared MCP pool loop"""
+        calls = self._tool_calls(agent, message, context)
+        results = await self.mcp_tools.call_tools_async(
+            calls, timeout=self.tool_timeout, max_concurrency=self.max_tool_concurrency
+        )
+        return self._pack_tool_results(calls, results)
+
+    def _tool_calls(self, agent, message, context):
+        """Build the (tool_name, parameters) calls needed for a message"""
+        tools_to_call = self._determine_tools_needed(message, agent['tools'])
+        return [
+            (tool_name, self._extract_tool_parameters(message, tool_name, context))
+            for tool_name in tools_to_call
+            if self.mcp_tools.has_tool(tool_name)
+        ]
+
+    @staticmethod
+    def _pack_tool_results(calls, results):
+        return [
+            {'tool': tool_name, 'result': result}
+            for (tool_name, _), result in zip(calls, results)
+        ]
 
-        return needed_tools
+    def _build_messages(self, agent, message, tool_results, history=None):
+        """Assemble the chat completion messages for an agent turn
+
+        history is the output of HistoryAssembler.assemble: a summary of
+        older turns and the recent turns, placed before the new message.
+        """
+        messages = [
+            {"role": "system", "content": agent['system_prompt']},
+            *(history or []),
+            {"role": "user", "content": message}
+        ]
+
+        # Add tool results to context if available
+        if tool_results:
+            tool_context = "Available tool results:\n"
+            for tool_result in tool_results:
+                tool_context += f"- {tool_result['tool']}: {tool_result['result']}\n"
+            messages.append({"role": "system", "content": tool_context})
+
+        return messages
+
+    def _response_cache_key(self, agent, messages):
+        """Cache key for an LLM call, or None when caching is off for this agent"""
+        if self.response_cache is None or not agent.get('cache_responses', True):
+            return None
+        return self.response_cache.make_key(self.model, messages)
+
+    def _fallback_response(self, agent, message):
+        """Response used when OpenAI client is not available"""
+        return f"I'm {agent['name']} and I'm here to help you with your {message}. I can assist with {', '.join(agent['tools'])} and other related tasks."
+
+    def _error_response(self, agent):
+        """Response used when the LLM call fails"""
+        return f"I'm {agent['name']} and I'm here to help, but I'm experiencing technical difficulties. Please try again."
+
+    def _determine_tools_needed(self, message, available_tools):
+        """Determine which tools are needed for the message"""
+        # Routing results are memoized, so this reuses the scan done for agent selection
+        tool_scores = self.router.route(message).tool_scores
+        return [tool for tool in available_tools if tool in tool_scores]
 
     def _extract_tool_parameters(self, message, tool_name, context):
         """Extract parameters for tool calls from message and context"""
@@ -0,0 +1,133 @@
+import re
+
+# Word pieces of up to four characters plus single punctuation marks. This
+# tracks BPE token counts of English chat text closely enough for budgeting
+# (erring high) at a fraction of the cost of a real tokenizer.
+_PIECE_RE = re.compile(r"\w{1,4}|[^\w\s]")
+
+# Per-message framing tokens added by the chat completions format
+MESSAGE_OVERHEAD = 4
+
+# Extra rows fetched beyond max_messages so turns that just left the window
+# are seen (and summarized) on the next assembly
+FETCH_SLACK = 8
+
+
+def estimate_tokens(text):
+    """Estimate the token count of a piece of text"""
+    return len(_PIECE_RE.findall(text)) if text else 0
+
+
+def extractive_summary(previous_summary, messages, line_chars=160):
+    """Append one shortened line per message to the running summary
+
+    Needs no model call, so summarizing adds no latency to a turn. Any
+    callable with the same signature (previous summary, chronological
+    ChatMessage rows -> new summary) can be used in its place, e.g. an LLM summary.
+    """
+    lines = previous_summary.splitlines() if previous_summary else []
+    for message in messages:
+        speaker = 'Customer' if message.type == 'user' else (message.agent_id or 'Agent')
+        content = ' '.join(message.content.split())
+        if len(content) > line_chars:
+            content = content[:line_chars - 1].rstrip() + '…'
+        lines.append(f"{speaker}: {content}")
+    return '\n'.join(lines)
+
+
+class HistoryAssembler:
+    """Fit recent chat turns into a token budget, folding older turns into a rolling summary
+
+    The summary lives in session_context (history_summary, plus
+    history_summary_upto, the id of the last message folded in) and is only
+    extended with turns that have left the window since the previous call,
+    so each assembly costs one small query however long the session is.
+    """
+
+    def __init__(self, session_manager, context_manager, token_budget=1200, summary_budget=300,
+                 max_messages=12, estimate=None, summarize=None):
+        self.session_manager = session_manager
+        self.context_manager = context_manager
+        self.token_budget = token_budget
+        self.summary_budget = summary_budget
+        self.max_messages = max_messages
+        self.estimate = estimate or estimate_tokens
+        self.summarize = summarize or extractive_summary
+
+    def assemble(self, session_id):
+        """Get the history messages to place before the next user message of a session
+
+        Returns chat-completion messages: a system message carrying the summary
+        of older turns (if any), then the most recent turns, oldest first.
+        """
+        fetch_count = self.max_messages + FETCH_SLACK
+        recent = self.session_manager.get_latest_messages(session_id, fetch_count)  # newest first
+
+        # Take turns newest first until the message cap or token budget is hit
+        window = 0
+        used = 0
+        for message in recent[:self.max_messages]:
+            cost = self.estimate(message.content) + MESSAGE_OVERHEAD
+            if used + cost > self.token_budget:
+                break
+            used += cost
+            window += 1
+
+        summary = self._update_summary(session_id, recent, window, fetch_count)
+
+        messages = []
+        if summary:
+            messages.append({"role": "system", "content": f"Summary of earlier conversation:\n{summary}"})
+        for message in reversed(recent[:window]):
+            messages.append({
+                "role": "user" if message.type == 'user' else "assistant",
+                "content": message.content
+            })
+        return messages
+
+    def _update_summary(self, session_id, recent, window, fetch_count):
+        """Fold turns that fell out of the window into the stored summary"""
+        context = self.context_manager.get_context(session_id)
+        summary = context.get('history_summary', '')
+        # Compared again when storing, in case another worker folds concurrently
+        read_upto = context.get('history_summary_upto')
+        upto = read_upto or 0
+
+        evicted = [message for message in reversed(recent[window:]) if message.id > upto]
+        if len(recent) == fetch_count and recent[-1].id > upto:
+            # Older unsummarized turns exist beyond what was fetched (e.g. a
+            # session that predates summaries); fold in a bounded page of them
+            older, _ = self.session_manager.get_chat_history_page(
+                session_id, limit=self.max_messages, after_id=upto
+            )
+            evicted = [message for message in older if message.id < recent[-1].id] + evicted
+
+        if not evicted:
+            return summary
+
+        summary = self._trim(self.summarize(summary, evicted))
+        stored = self.context_manager.update_many(session_id, {
+            'history_summary': summary,
+            # Newest message outside the window; anything older that was not
+            # folded in is skipped so the work per turn stays bounded
+            'history_summary_upto': recent[window].id,
+        }, expected={'history_summary_upto': read_upto})
+        if not stored:
+            # Another worker folded these turns first; keep its summary
+            return self.context_manager.get_context(session_id).get('history_summary', summary)
+        return summary
+
+    def _trim(self, summary):
+        """Drop the oldest summary lines until it fits summary_budget"""
+        lines = summary.splitlines()
+        costs = [self.estimate(line) for line in lines]
+        total = sum(costs)
+        start = 0
+        while total > self.summary_budget and start < len(lines) - 1:
+            total -= costs[start]
+            start += 1
+        summary = '\n'.join(lines[start:])
+        if total > self.summary_budget:
+            # A single oversized line; the estimate never exceeds the character count
+            summary = summary[-self.summary_budget:]
+        return summary
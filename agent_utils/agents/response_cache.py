@@ -0,0 +1,31 @@
+import hashlib
+import json
+from ..caching import TTLCache
+
+
+class ResponseCache:
+    """Cache LLM responses keyed on a normalized hash of the model and prompt messages"""
+
+    def __init__(self, maxsize=1024, ttl=300, backend=None):
+        # Any backend exposing get/set/stats (e.g. a shared cache) can be plugged in
+        self.backend = backend or TTLCache(maxsize=maxsize, ttl=ttl)
+
+    @staticmethod
+    def make_key(model, messages):
+        """Hash the model and messages, ignoring case and whitespace differences"""
+        normalized = [
+            [message['role'], ' '.join(str(message['content']).split()).lower()]
+            for message in messages
+        ]
+        payload = json.dumps([model, normalized], separators=(',', ':'), default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def set(self, key, response):
+        self.backend.set(key, response)
+
+    def stats(self):
+        """Get hit/miss/eviction counters and hit rate"""
+        return self.backend.stats()
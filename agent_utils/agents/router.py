@@ -0,0 +1,50 @@
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+RoutingResult = namedtuple('RoutingResult', ['agent_id', 'agent_scores', 'tool_scores'])
+
+
+class KeywordRouter:
+    """Route messages to agents and tools with a single precompiled word-boundary regex"""
+
+    def __init__(self, agent_keywords, tool_keywords, default_agent='support_agent', cache_size=64):
+        self.default_agent = default_agent
+        # Earlier agents in the table win ties, matching the old cascade order
+        self._agent_priority = {agent_id: index for index, agent_id in enumerate(agent_keywords)}
+        self._targets = {}  # keyword -> (agent_ids, tool_names)
+
+        for agent_id, keywords in agent_keywords.items():
+            for keyword in keywords:
+                self._targets.setdefault(keyword.lower(), ([], []))[0].append(agent_id)
+        for tool_name, keywords in tool_keywords.items():
+            for keyword in keywords:
+                self._targets.setdefault(keyword.lower(), ([], []))[1].append(tool_name)
+
+        # Longest keywords first so 'payment' is preferred over 'pay'; whole
+        # words only (with common inflections such as 'refunded' or 'paying')
+        # so 'time' no longer matches 'sometimes'. Compounds like 'timetable'
+        # are listed as keywords of their own
+        alternation = '|'.join(re.escape(keyword) for keyword in sorted(self._targets, key=len, reverse=True))
+        # Matching lowercased text is several times faster than re.IGNORECASE
+        self._pattern = re.compile(rf"\b({alternation})(?:s|es|d|ed|ing)?\b")
+        # Only meant to let tool selection reuse the scan done for agent
+        # selection in the same turn, so it holds few (raw customer) messages
+        self.route = lru_cache(maxsize=cache_size)(self._route)
+
+    def _route(self, message):
+        """Scan a message once and score every agent and tool it mentions"""
+        agent_scores = {}
+        tool_scores = {}
+        for match in self._pattern.finditer(message.lower()):
+            agent_ids, tool_names = self._targets[match.group(1)]
+            for agent_id in agent_ids:
+                agent_scores[agent_id] = agent_scores.get(agent_id, 0) + 1
+            for tool_name in tool_names:
+                tool_scores[tool_name] = tool_scores.get(tool_name, 0) + 1
+
+        if agent_scores:
+            agent_id = min(agent_scores, key=lambda agent: (-agent_scores[agent], self._agent_priority[agent]))
+        else:
+            agent_id = self.default_agent
+        return RoutingResult(agent_id, agent_scores, tool_scores)
@@ -0,0 +1,84 @@
+import re
+import zlib
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed when semantic routing is enabled
+    np = None
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+def hashing_embedding(texts, dim=1024):
+    """Embed texts offline as hashed bags of words and character trigrams
+
+    Deterministic and dependency-free apart from NumPy, so routing works
+    without network access or model downloads. Any callable with the same
+    signature (list of str -> array of shape (len(texts), d)) can be used
+    in its place, e.g. a local sentence-embedding model.
+    """
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in _WORD_RE.findall(text.lower()):
+            matrix[row, zlib.crc32(word.encode()) % dim] += 2.0
+            padded = f"<{word}>"
+            for start in range(len(padded) - 2):
+                matrix[row, zlib.crc32(padded[start:start + 3].encode()) % dim] += 1.0
+    return matrix
+
+
+class SemanticRouter:
+    """Classify messages to agents by cosine similarity against embedded example utterances"""
+
+    def __init__(self, agent_examples, embed=None, threshold=0.35):
+        if np is None:
+            raise ImportError("Semantic routing requires numpy (pip install numpy)")
+
+        self.embed = embed or hashing_embedding
+        self.threshold = threshold
+        self.agent_ids = []
+
+        # Examples are stored grouped by agent so per-agent maxima can be
+        # taken with a single reduceat over the similarity matrix
+        texts = []
+        starts = []
+        for agent_id, examples in agent_examples.items():
+            if not examples:
+                continue
+            self.agent_ids.append(agent_id)
+            starts.append(len(texts))
+            texts.extend(examples)
+
+        self._starts = np.array(starts)
+        self._matrix = self._normalize(self.embed(texts))
+
+    @staticmethod
+    def _normalize(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def scores(self, messages):
+        """Get a (len(messages), len(agent_ids)) matrix of best-example similarities"""
+        similarities = self._normalize(self.embed(list(messages))) @ self._matrix.T
+        return np.maximum.reduceat(similarities, self._starts, axis=1)
+
+    def classify_batch(self, messages):
+        """Classify many messages at once, returning (agent_id, score) pairs
+
+        agent_id is None when the best score falls below the threshold.
+        """
+        if not messages:
+            return []
+        scores = self.scores(messages)
+        best = scores.argmax(axis=1)
+        results = []
+        for row, column in enumerate(best):
+            score = float(scores[row, column])
+            results.append((self.agent_ids[column] if score >= self.threshold else None, score))
+        return results
+
+    def classify(self, message):
+        """Classify one message, returning (agent_id or None, score)"""
+        return self.classify_batch([message])[0]
@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache with an optional time-to-live per entry"""
+
+    def __init__(self, maxsize=1024, ttl=None, on_evict=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.RLock()
+
+    def _expired(self, expires_at, now):
+        return expires_at is not None and expires_at <= now
+
+    def get(self, key, default=None):
+        """Get a value, refreshing its recency; expired entries count as misses"""
+        evicted = None
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING and self._expired(entry[1], time.monotonic()):
+                evicted = (key, self._data.pop(key)[0])
+                self.evictions += 1
+                entry = _MISSING
+
+            if entry is _MISSING:
+                self.misses += 1
+                value = default
+            else:
+                self._data.move_to_end(key)
+                self.hits += 1
+                value = entry[0]
+
+        if evicted:
+            self._notify([evicted])
+        return value
+
+    def set(self, key, value, ttl=None):
+        """Store a value, evicting least recently used entries beyond maxsize"""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        evicted = []
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while self.maxsize and len(self._data) > self.maxsize:
+                evicted.append(self._pop_oldest())
+        self._notify(evicted)
+
+    def pop(self, key, default=None):
+        """Remove an entry without counting it as an eviction"""
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[0]
+
+    def peek(self, key, default=None):
+        """Get a value without touching recency or hit/miss counters"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or self._expired(entry[1], time.monotonic()):
+                return default
+            return entry[0]
+
+    def expire(self):
+        """Evict all expired entries, returning how many were removed"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (_, expires_at) in self._data.items() if self._expired(expires_at, now)]
+            evicted = [(key, self._data.pop(key)[0]) for key in expired]
+            self.evictions += len(evicted)
+        self._notify(evicted)
+        return len(evicted)
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._data.clear()
+
+    def keys(self):
+        with self._lock:
+            return list(self._data.keys())
+
+    def __contains__(self, key):
+        return self.peek(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return len(self._data)
+
+    def _pop_oldest(self):
+        key, (value, _) = self._data.popitem(last=False)
+        self.evictions += 1
+        return key, value
+
+    def _notify(self, evicted):
+        # Callbacks run outside the lock so they may touch the cache safely
+        if self.on_evict:
+            for key, value in evicted:
+                self.on_evict(key, value)
+
+    def stats(self):
+        """Get hit/miss/eviction counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
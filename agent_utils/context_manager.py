@@ -1,68 +1,253 @@
-import sqlite3
+import asyncio
+import atexit
 import json
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from .caching import TTLCache
+from .database import DatabaseManager
+from .metrics import metrics
+
+
+class _ContextEntry:
+    """Cached context of one session plus the stored version it was read at"""
+
+    __slots__ = ('data', 'version')
+
+    def __init__(self, data, version=0):
+        self.data = data
+        self.version = version
 
 
 class ContextManager:
     """Manage conversation context and state with SQLite persistence"""
 
-    def __init__(self):
-        self.memory_store = {}  # In-memory cache
+    def __init__(self, db_manager=None, write_behind=False, flush_interval=1.0,
+                 cache_size=10000, cache_ttl=3600, verify_versions=False):
+        self.db = db_manager or DatabaseManager.shared()
+        # Bounded in-memory cache of session_id -> _ContextEntry
+        self.memory_store = TTLCache(maxsize=cache_size, ttl=cache_ttl, on_evict=self._on_evict)
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval
+        self.verify_versions = verify_versions
+        # session_id -> _ContextEntry with unflushed changes; holding the entry
+        # here keeps it from being lost if it expires from memory_store first
+        self._dirty = {}
+        self._lock = threading.RLock()
+        # session_id -> entry of the open batch; a context variable rather than a
+        # thread-local so a batch opened in a coroutine spans its asyncio.to_thread calls
+        self._pending = ContextVar(f'context_batch_{id(self)}', default=None)
+        self._stop = threading.Event()
+        self._flusher = None
+
+        if write_behind:
+            # A zero interval means the caller flushes (e.g. at request end)
+            if flush_interval:
+                self._flusher = threading.Thread(target=self._flush_loop, name='context-flusher', daemon=True)
+                self._flusher.start()
+            atexit.register(self.close)
 
     def update_context(self, session_id, key, value):
         """Update context for a session"""
+        self.update_many(session_id, {key: value})
+
+    @metrics.timed('context_save')
+    def update_many(self, session_id, updates, expected=None, increments=None):
+        """Update several context fields for a session with a single write
+
+        expected maps fields to the values the caller read (None for a
+        missing field); if any has changed nothing is written and False is
+        returned. increments are added to integer fields. Both are checked
+        against this process's copy, as SharedContextManager checks them
+        against the shared store.
+        """
         # Update in-memory cache
-        if session_id not in self.memory_store:
-            self.memory_store[session_id] = {}
-        self.memory_store[session_id][key] = value
+        with self._lock:
+            entry = self._get_entry(session_id)
+            if expected and any(entry.data.get(key) != value for key, value in expected.items()):
+                return False
+            entry.data.update(updates)
+            for key, amount in (increments or {}).items():
+                entry.data[key] = entry.data.get(key, 0) + amount
 
         # Update database
-        self._save_to_db(session_id)
+        self._save_to_db(session_id, entry=entry)
+        return True
 
+    @contextmanager
+    def batch(self):
+        """Defer context writes made in this block and persist them in one transaction"""
+        pending = self._open_batch()
+        try:
+            yield
+        finally:
+            if pending is not None:
+                self._pending.set(None)
+                self._commit_batch(pending)
+
+    @asynccontextmanager
+    async def batch_async(self):
+        """batch() for coroutines; the write runs in a thread, off the event loop"""
+        pending = self._open_batch()
+        try:
+            yield
+        finally:
+            if pending is not None:
+                self._pending.set(None)
+                await asyncio.to_thread(self._commit_batch, pending)
+
+    def _open_batch(self):
+        """Start collecting deferred writes, or return None inside an open batch"""
+        if self._pending.get() is not None:
+            return None
+        pending = {}
+        self._pending.set(pending)
+        return pending
+
+    def _commit_batch(self, pending):
+        if self.write_behind:
+            for session_id, entry in pending.items():
+                self._save_to_db(session_id, deferred=False, entry=entry)
+        else:
+            self._write(pending)
+
+    @metrics.timed('context_load')
     def get_context(self, session_id):
         """Get context for a session"""
-        if session_id not in self.memory_store:
-            self._load_from_db(session_id)
-        return self.memory_store.get(session_id, {})
+        return self._get_entry(session_id).data
+
+    def _get_entry(self, session_id):
+        """Get the cached entry for a session, loading or reloading it as needed"""
+        entry = self.memory_store.get(session_id)
+        if entry is None:
+            return self._load_from_db(session_id)
 
-    def _save_to_db(self, session_id):
-        """Save context to database"""
-        conn = sqlite3.connect('chat_sessions.db')
-        cursor = conn.cursor()
+        # Another worker may have written this session since it was cached;
+        # unflushed local changes take precedence over the stored copy
+        if self.verify_versions and session_id not in self._dirty:
+            if self._stored_version(session_id) != entry.version:
+                return self._load_from_db(session_id)
+        return entry
 
-        context_data = json.dumps(self.memory_store.get(session_id, {}))
-        cursor.execute('''
-            INSERT OR REPLACE INTO session_context (session_id, context_data)
-            VALUES (?, ?)
-        ''', (session_id, context_data))
+    def _stored_version(self, session_id):
+        with self.db.connection() as conn:
+            row = conn.execute('SELECT version FROM session_context WHERE session_id = ?', (session_id,)).fetchone()
+        return row[0] if row else 0
 
-        conn.commit()
-        conn.close()
+    def _save_to_db(self, session_id, deferred=True, entry=None):
+        """Save context to database, or mark it dirty when writes are deferred"""
+        entry = entry or self._dirty.get(session_id) or self.memory_store.peek(session_id)
+        if entry is None:
+            return
+
+        pending = self._pending.get()
+        if deferred and pending is not None:
+            pending[session_id] = entry
+            return
+
+        if self.write_behind:
+            with self._lock:
+                self._dirty[session_id] = entry
+                # Re-cache the entry, refreshing its TTL, so reads see the changes
+                self.memory_store.set(session_id, entry)
+            return
+
+        self._write({session_id: entry})
+
+    def _write(self, entries):
+        """Persist several session contexts in one transaction"""
+        with self._lock:
+            rows = [(session_id, entry, json.dumps(entry.data)) for session_id, entry in entries.items()]
+        if not rows:
+            return
+
+        with self.db.connection() as conn:
+            for session_id, entry, context_data in rows:
+                cursor = conn.execute('''
+                    INSERT INTO session_context (session_id, context_data, version, updated_at)
+                    VALUES (?, ?, 1, CURRENT_TIMESTAMP)
+                    ON CONFLICT(session_id) DO UPDATE SET
+                        context_data = excluded.context_data,
+                        version = session_context.version + 1,
+                        updated_at = CURRENT_TIMESTAMP
+                    RETURNING version
+                ''', (session_id, context_data))
+                entry.version = cursor.fetchone()[0]
+
+    def _on_evict(self, session_id, entry):
+        """Persist a session's unflushed changes before its cache entry is dropped"""
+        with self._lock:
+            if self._dirty.get(session_id) is not entry:
+                return
+            del self._dirty[session_id]
+        try:
+            self._write({session_id: entry})
+        except Exception as e:
+            print(f"⚠️ Failed to persist evicted context for {session_id}: {e}")
+
+    def flush(self):
+        """Write all dirty sessions to the database"""
+        with self._lock:
+            if not self._dirty:
+                return 0
+            entries, self._dirty = self._dirty, {}
+
+        try:
+            self._write(entries)
+        except Exception:
+            # Keep the sessions dirty so the next flush retries them
+            with self._lock:
+                for session_id, entry in entries.items():
+                    self._dirty.setdefault(session_id, entry)
+            raise
+        return len(entries)
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+                self.memory_store.expire()
+            except Exception as e:
+                print(f"⚠️ Context flush failed: {e}")
+
+    def close(self):
+        """Stop the background flusher and write any pending context"""
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=self.flush_interval + 5)
+            self._flusher = None
+        self.flush()
 
     def _load_from_db(self, session_id):
         """Load context from database"""
-        conn = sqlite3.connect('chat_sessions.db')
-        cursor = conn.cursor()
-
-        cursor.execute('SELECT context_data FROM session_context WHERE session_id = ?', (session_id,))
-        result = cursor.fetchone()
+        with self.db.connection() as conn:
+            cursor = conn.execute(
+                'SELECT context_data, version FROM session_context WHERE session_id = ?', (session_id,)
+            )
+            result = cursor.fetchone()
 
         if result:
-            self.memory_store[session_id] = json.loads(result[0])
+            entry = _ContextEntry(json.loads(result[0]), result[1])
         else:
-            self.memory_store[session_id] = {}
+            entry = _ContextEntry({})
 
-        conn.close()
+        with self._lock:
+            # Never replace an entry that holds unflushed changes
+            existing = self._dirty.get(session_id)
+            if existing is not None:
+                self.memory_store.set(session_id, existing)
+                return existing
+            self.memory_store.set(session_id, entry)
+        return entry
 
     def clear_context(self, session_id):
         """Clear context for a session"""
-        if session_id in self.memory_store:
-            del self.memory_store[session_id]
+        with self._lock:
+            self.memory_store.pop(session_id)
+            self._dirty.pop(session_id, None)
 
-        conn = sqlite3.connect('chat_sessions.db')
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM session_context WHERE session_id = ?', (session_id,))
-        conn.commit()
-        conn.close()
+        with self.db.connection() as conn:
+            conn.execute('DELETE FROM session_context WHERE session_id = ?', (session_id,))
 
     def get_context_keys(self, session_id):
         """Get all context keys for a session"""
@@ -71,6 +256,13 @@ class ContextManager:
 
     def clear_context_field(self, session_id, key):
         """Remove a specific field from context"""
-        if session_id in self.memory_store and key in self.memory_store[session_id]:
-            del self.memory_store[session_id][key]
-            self._save_to_db(session_id)
+        entry = self.memory_store.peek(session_id)
+        if entry is not None and key in entry.data:
+            del entry.data[key]
+            self._save_to_db(session_id, entry=entry)
+
+    def get_cache_stats(self):
+        """Get hit/miss/eviction counters for the context cache"""
+        stats = self.memory_store.stats()
+        stats['dirty'] = len(self._dirty)
+        return stats
@@ -5,5 +5,7 @@ This package contains database management functionality.
 """
 
 from .database_manager import DatabaseManager
+from .connection_pool import ConnectionPool
+from .rows import ChatMessage, Session
 
-__all__ = ['DatabaseManager']
+__all__ = ['DatabaseManager', 'ConnectionPool', 'ChatMessage', 'Session']
@@ -0,0 +1,127 @@
+import gzip
+import json
+import zlib
+from datetime import datetime
+from .database_manager import DatabaseManager
+from .chat_history_dao import ChatHistoryDAO
+from .session_dao import SessionDAO
+
+# Compressed output is emitted in chunks of roughly this many input bytes
+GZIP_CHUNK_SIZE = 64 * 1024
+
+
+def normalize_timestamp(value):
+    """Convert an ISO date or datetime string to SQLite's CURRENT_TIMESTAMP format"""
+    if value is None or value == '':
+        return None
+    return datetime.fromisoformat(value).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def open_archive(path):
+    """Open a JSON Lines archive for reading as text, gzip-compressed or not"""
+    with open(path, 'rb') as f:
+        compressed = f.read(2) == b'\x1f\x8b'
+    return gzip.open(path, 'rt', encoding='utf-8') if compressed else open(path, 'r', encoding='utf-8')
+
+
+class ChatArchive:
+    """Stream sessions and chat history to JSON Lines archives and load them back
+
+    Each line is one record: {"kind": "session", ...} or {"kind": "message", ...}.
+    With a date range, sessions are selected by creation time and messages by
+    their own timestamp, so nightly exports pick up new messages in older sessions.
+    """
+
+    def __init__(self, db_path='chat_sessions.db', db_manager=None):
+        self.db = db_manager or DatabaseManager.shared(db_path)
+        self.sessions = SessionDAO(db_manager=self.db)
+        self.history = ChatHistoryDAO(db_manager=self.db)
+
+    @staticmethod
+    def normalize_dates(since, until):
+        """Normalize an export date range, raising ValueError for malformed dates"""
+        return normalize_timestamp(since), normalize_timestamp(until)
+
+    def iter_records(self, customer_id=None, since=None, until=None):
+        """Yield session records, then message records, matching the filters"""
+        since, until = self.normalize_dates(since, until)
+        for session in self.sessions.iter_sessions(customer_id, since, until):
+            yield {'kind': 'session', **session.to_dict()}
+        for message in self.history.iter_messages(customer_id, since, until):
+            yield {'kind': 'message', **message.to_dict()}
+
+    def iter_ndjson(self, customer_id=None, since=None, until=None):
+        """Yield the export as newline-delimited JSON lines"""
+        for record in self.iter_records(customer_id, since, until):
+            yield json.dumps(record, separators=(',', ':'), default=str) + '\n'
+
+    def iter_gzip(self, customer_id=None, since=None, until=None, level=6):
+        """Yield the export as gzip-compressed JSON Lines chunks"""
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+        buffer = []
+        buffered = 0
+        for line in self.iter_ndjson(customer_id, since, until):
+            buffer.append(line)
+            buffered += len(line)
+            if buffered >= GZIP_CHUNK_SIZE:
+                chunk = compressor.compress(''.join(buffer).encode('utf-8'))
+                buffer, buffered = [], 0
+                if chunk:
+                    yield chunk
+        chunk = compressor.compress(''.join(buffer).encode('utf-8')) + compressor.flush()
+        if chunk:
+            yield chunk
+
+    def export_to_file(self, path, customer_id=None, since=None, until=None, compress=None):
+        """Write an export to path (gzip if compress, or if path ends in .gz); returns bytes written"""
+        if compress is None:
+            compress = path.endswith('.gz')
+        written = 0
+        with open(path, 'wb') as f:
+            if compress:
+                chunks = self.iter_gzip(customer_id, since, until)
+            else:
+                chunks = (line.encode('utf-8') for line in self.iter_ndjson(customer_id, since, until))
+            for chunk in chunks:
+                f.write(chunk)
+                written += len(chunk)
+        return written
+
+    def import_lines(self, lines, batch_size=5000):
+        """Load archive lines, inserting each batch of records in its own transaction
+
+        Sessions that already exist are kept; messages get new ids. Session
+        summaries are rebuilt once at the end rather than per batch, in
+        short transactions of their own.
+        Returns (sessions inserted, messages inserted).
+        """
+        sessions, messages = [], []
+        totals = [0, 0]
+        touched = set()
+
+        def flush():
+            # Sessions first so a batch never holds messages for a session not yet written
+            if sessions:
+                totals[0] += self.sessions.add_sessions_bulk(sessions)
+                sessions.clear()
+            if messages:
+                touched.update(message['session_id'] for message in messages)
+                totals[1] += self.history.add_messages_bulk(messages, update_summaries=False)
+                messages.clear()
+
+        for line in lines:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            kind = record.pop('kind', 'message')
+            (sessions if kind == 'session' else messages).append(record)
+            if len(sessions) + len(messages) >= batch_size:
+                flush()
+        flush()
+        self.history.rebuild_summaries(touched)
+        return tuple(totals)
+
+    def import_file(self, path, batch_size=5000):
+        """Load a JSON Lines archive (optionally gzip-compressed)"""
+        with open_archive(path) as f:
+            return self.import_lines(f, batch_size)
@@ -0,0 +1,162 @@
+import os
+import sqlite3
+from .connection_pool import ConnectionPool
+from .migrations import MIGRATIONS
+
+POSTGRES_SCHEMES = ('postgres://', 'postgresql://')
+
+
+def create_backend(location='chat_sessions.db', pool_size=8):
+    """Create the storage backend for a database location
+
+    A postgres:// or postgresql:// URL selects PostgreSQL; anything else is
+    a SQLite file path.
+    """
+    if location.startswith(POSTGRES_SCHEMES):
+        # Imported here so psycopg is only needed when PostgreSQL is configured
+        from .postgres import PostgresBackend
+        return PostgresBackend(location, pool_size=pool_size)
+    return SQLiteBackend(location, pool_size=pool_size)
+
+
+class StorageBackend:
+    """Interface between DatabaseManager and a database engine
+
+    Backends hand out pooled connections that accept sqlite3-style SQL with
+    ? placeholders and commit on success, and own everything that differs
+    between engines: base schema, migrations, locking and maintenance.
+    """
+
+    dialect = None
+    # Whether chat_history.metadata/tool_calls can hold compressed BLOBs
+    supports_binary_payloads = False
+    schema = []
+    migrations = []
+
+    def connection(self):
+        """Borrow a pooled connection; commits on success, rolls back on error"""
+        raise NotImplementedError
+
+    def begin_write(self, conn):
+        """Start a write transaction, taking any engine-level write lock up front"""
+        raise NotImplementedError
+
+    def begin_exclusive(self, conn):
+        """Start a transaction that concurrent schema migrations serialize on"""
+        raise NotImplementedError
+
+    def table_info(self, conn, table_name):
+        """Describe a table's columns as (cid, name, type, notnull, default, pk) rows, like PRAGMA table_info"""
+        raise NotImplementedError
+
+    def storage_bytes(self):
+        """Size of the database on disk in bytes"""
+        raise NotImplementedError
+
+    def backup(self, backup_path):
+        raise NotImplementedError(f"Online backup is not supported for {self.dialect}")
+
+    def restore(self, backup_path):
+        raise NotImplementedError(f"Restore is not supported for {self.dialect}")
+
+    def close(self):
+        """Close all pooled connections"""
+        raise NotImplementedError
+
+
+class SQLiteBackend(StorageBackend):
+    """Single-node storage in a SQLite file, shared through a WAL connection pool"""
+
+    dialect = 'sqlite'
+    supports_binary_payloads = True
+    migrations = MIGRATIONS
+
+    schema = [
+        '''
+        CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            customer_id TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            metadata TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS chat_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            message_type TEXT NOT NULL,
+            content TEXT NOT NULL,
+            agent_id TEXT,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            metadata TEXT,
+            tool_calls TEXT,
+            FOREIGN KEY (session_id) REFERENCES sessions (id)
+        )
+        ''',
+        # Agents table for multi-agent orchestration
+        '''
+        CREATE TABLE IF NOT EXISTS agents (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            description TEXT,
+            tools TEXT,
+            status TEXT DEFAULT 'active',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        # Context table for session context management
+        '''
+        CREATE TABLE IF NOT EXISTS session_context (
+            session_id TEXT PRIMARY KEY,
+            context_data TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (session_id) REFERENCES sessions (id)
+        )
+        ''',
+    ]
+
+    def __init__(self, db_path='chat_sessions.db', pool_size=8):
+        self.db_path = db_path
+        self.pool = ConnectionPool(db_path, max_connections=pool_size)
+
+    def connection(self):
+        return self.pool.connection()
+
+    def begin_write(self, conn):
+        # Taking the write lock up front avoids a deadlock-prone upgrade from
+        # a read lock part way through the transaction
+        conn.execute('BEGIN IMMEDIATE')
+
+    def begin_exclusive(self, conn):
+        conn.execute('BEGIN IMMEDIATE')
+
+    def table_info(self, conn, table_name):
+        return conn.execute(f"PRAGMA table_info({table_name})").fetchall()
+
+    def storage_bytes(self):
+        """Size of the database file plus its WAL"""
+        return sum(
+            os.path.getsize(path) for path in (self.db_path, f"{self.db_path}-wal")
+            if os.path.exists(path)
+        )
+
+    def backup(self, backup_path):
+        # Use the online backup API so the copy includes pages still in the WAL
+        with self.connection() as conn:
+            target = sqlite3.connect(backup_path)
+            try:
+                conn.backup(target)
+            finally:
+                target.close()
+
+    def restore(self, backup_path):
+        source = sqlite3.connect(backup_path)
+        try:
+            with self.connection() as conn:
+                source.backup(conn)
+        finally:
+            source.close()
+
+    def close(self):
+        self.pool.close_all()
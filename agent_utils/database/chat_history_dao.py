@@ -1,143 +1,379 @@
-import sqlite3
-import json
 from datetime import datetime
+from .database_manager import DatabaseManager
+from .session_summary_dao import SessionSummaryDAO
+from .payload_codec import decode_payload
+from .rows import ChatMessage, select_rows
 
 
 class ChatHistoryDAO:
     """Data Access Object for chat history operations"""
 
-    def __init__(self, db_path='chat_sessions.db'):
+    def __init__(self, db_path='chat_sessions.db', db_manager=None):
         self.db_path = db_path
+        self.db = db_manager or DatabaseManager.shared(db_path)
+        self._search_available = None
 
     def get_connection(self):
-        """Get database connection"""
-        return sqlite3.connect(self.db_path)
+        """Borrow a pooled database connection"""
+        return self.db.connection()
 
     def add_message(self, session_id, message_type, content, agent_id=None, metadata=None, tool_calls=None):
         """Add a message to chat history"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.get_connection() as conn:
+            cursor = conn.execute('''
+                INSERT INTO chat_history (session_id, message_type, content, agent_id, metadata, tool_calls)
+                VALUES (?, ?, ?, ?, ?, ?)
+                RETURNING timestamp
+            ''', (session_id, message_type, content, agent_id,
+                  self.db.payload_codec.encode(metadata or {}), self.db.payload_codec.encode(tool_calls or [])))
+            timestamp = cursor.fetchone()[0]
+            SessionSummaryDAO.record_message(conn, session_id, message_type, agent_id, tool_calls, timestamp)
 
-        cursor.execute('''
-            INSERT INTO chat_history (session_id, message_type, content, agent_id, metadata, tool_calls)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (session_id, message_type, content, agent_id,
-              json.dumps(metadata or {}), json.dumps(tool_calls or [])))
+    def add_messages_bulk(self, messages, update_summaries=True):
+        """Insert many messages with one executemany in a single transaction
 
-        conn.commit()
-        conn.close()
+        messages is an iterable of dicts shaped like ChatMessage.to_dict()
+        (session_id, type, content and optionally agent_id, metadata,
+        tool_calls and timestamp). It is consumed lazily, so a
+        generator over an archive of any size is inserted in constant memory.
+        Summaries of the touched sessions are folded in memory and merged
+        into the stored ones once at the end; callers loading many batches can
+        skip that and call rebuild_summaries once instead. Returns the number
+        inserted.
+        """
+        summaries = {}
+        encode = self.db.payload_codec.encode
+        # CURRENT_TIMESTAMP is UTC; use the same clock for messages without a timestamp
+        now = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
 
-    def get_chat_history(self, session_id, limit=100):
-        """Get chat history for a session"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        def rows():
+            for message in messages:
+                if update_summaries:
+                    summary = summaries.get(message['session_id'])
+                    if summary is None:
+                        summary = summaries[message['session_id']] = SessionSummaryDAO._empty()
+                    SessionSummaryDAO._fold(summary, message['type'], message.get('agent_id'),
+                                            message.get('tool_calls'), message.get('timestamp') or now)
+                yield (
+                    message['session_id'],
+                    message['type'],
+                    message['content'],
+                    message.get('agent_id'),
+                    encode(message.get('metadata') or {}),
+                    encode(message.get('tool_calls') or []),
+                    message.get('timestamp')
+                )
 
-        cursor.execute('''
-            SELECT message_type, content, agent_id, timestamp, metadata, tool_calls
-            FROM chat_history
-            WHERE session_id = ?
-            ORDER BY timestamp ASC
-            LIMIT ?
-        ''', (session_id, limit))
+        with self.get_connection() as conn:
+            cursor = conn.executemany('''
+                INSERT INTO chat_history (session_id, message_type, content, agent_id, metadata, tool_calls, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+            ''', rows())
+            inserted = cursor.rowcount
 
-        history = cursor.fetchall()
-        conn.close()
+            for session_id, summary in summaries.items():
+                SessionSummaryDAO.merge(conn, session_id, summary)
+        return inserted
 
-        return [
-            {
-                'type': row[0],
-                'content': row[1],
-                'agent_id': row[2],
-                'timestamp': row[3],
-                'metadata': json.loads(row[4]) if row[4] else {},
-                'tool_calls': json.loads(row[5]) if row[5] else []
-            }
-            for row in history
-        ]
+    def rebuild_summaries(self, session_ids, batch_size=100):
+        """Recompute the summaries of the given sessions, batch_size sessions per transaction
 
-    def get_latest_messages(self, session_id, count=10):
-        """Get the latest N messages from a session"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT message_type, content, agent_id, timestamp, metadata, tool_calls
-            FROM chat_history
-            WHERE session_id = ?
-            ORDER BY timestamp DESC
-            LIMIT ?
-        ''', (session_id, count))
-
-        history = cursor.fetchall()
-        conn.close()
-
-        # Reverse to get chronological order
-        return [
-            {
-                'type': row[0],
-                'content': row[1],
-                'agent_id': row[2],
-                'timestamp': row[3],
-                'metadata': json.loads(row[4]) if row[4] else {},
-                'tool_calls': json.loads(row[5]) if row[5] else []
-            }
-            for row in reversed(history)
-        ]
+        Short transactions keep a rebuild after a large import from holding
+        the write lock against live traffic for its whole duration.
+        """
+        session_ids = list(session_ids)
+        for start in range(0, len(session_ids), batch_size):
+            with self.get_connection() as conn:
+                for session_id in session_ids[start:start + batch_size]:
+                    SessionSummaryDAO.rebuild(conn, session_id)
 
-    def get_message_count(self, session_id):
-        """Get total message count for a session"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    def reencode_payloads(self, batch_size=1000):
+        """Rewrite stored metadata and tool_calls in the configured encoding
 
-        cursor.execute('SELECT COUNT(*) FROM chat_history WHERE session_id = ?', (session_id,))
-        count = cursor.fetchone()[0]
+        Walks chat_history in id order, one short transaction per batch, and
+        only rewrites rows whose stored bytes change, so it can run against a
+        live database and be resumed or repeated. Returns (rows scanned, rows rewritten).
+        """
+        encode = self.db.payload_codec.encode
+        scanned = rewritten = 0
+        last_id = 0
+        while True:
+            with self.get_connection() as conn:
+                rows = conn.execute('''
+                    SELECT id, metadata, tool_calls FROM chat_history
+                    WHERE id > ? ORDER BY id LIMIT ?
+                ''', (last_id, batch_size)).fetchall()
+                if not rows:
+                    break
+                updates = []
+                for message_id, metadata, tool_calls in rows:
+                    new_metadata = encode(decode_payload(metadata, {}))
+                    new_tool_calls = encode(decode_payload(tool_calls, []))
+                    if new_metadata != metadata or new_tool_calls != tool_calls:
+                        updates.append((new_metadata, new_tool_calls, message_id))
+                conn.executemany('UPDATE chat_history SET metadata = ?, tool_calls = ? WHERE id = ?', updates)
+            scanned += len(rows)
+            rewritten += len(updates)
+            last_id = rows[-1][0]
+        return scanned, rewritten
 
-        conn.close()
-        return count
+    def iter_messages(self, customer_id=None, since=None, until=None):
+        """Stream ChatMessage rows in timestamp order, optionally filtered by customer and [since, until)
 
-    def get_messages_by_agent(self, session_id, agent_id):
-        """Get all messages from a specific agent in a session"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        Rows are read from an open cursor as the generator is consumed, so
+        memory stays constant however many messages match.
+        """
+        conditions = []
+        params = []
+        if customer_id is not None:
+            conditions.append('session_id IN (SELECT id FROM sessions WHERE customer_id = ?)')
+            params.append(customer_id)
+        if since is not None:
+            conditions.append('timestamp >= ?')
+            params.append(since)
+        if until is not None:
+            conditions.append('timestamp < ?')
+            params.append(until)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        with self.get_connection() as conn:
+            yield from select_rows(conn, ChatMessage, f'''
+                SELECT {ChatMessage.COLUMNS}
+                FROM chat_history
+                {where}
+                ORDER BY timestamp, id
+            ''', params, stream=True)
+
+    @staticmethod
+    def _match_expression(query):
+        """Turn free text into an FTS5 query of quoted terms, all of which must match
+
+        Quoting keeps punctuation in user input (promo-code, 50%) from being
+        read as FTS5 operators; a trailing * on a term makes it a prefix search.
+        """
+        terms = []
+        for term in query.split():
+            prefix = term.endswith('*')
+            term = term.rstrip('*')
+            if term:
+                terms.append('"' + term.replace('"', '""') + '"' + ('*' if prefix else ''))
+        return ' '.join(terms)
+
+    @staticmethod
+    def _tsquery_expression(query):
+        """Build a PostgreSQL tsquery expression (SQL, params) requiring every term
+
+        Plain terms match as phrases of their tokens, like the quoted FTS5
+        terms above; a trailing * makes a term a prefix search.
+        """
+        parts = []
+        params = []
+        for term in query.split():
+            prefix = term.endswith('*')
+            term = term.rstrip('*')
+            if not term:
+                continue
+            if prefix:
+                parts.append("to_tsquery('simple', ?)")
+                params.append("'" + term.replace("'", "''") + "':*")
+            else:
+                parts.append("phraseto_tsquery('simple', ?)")
+                params.append(term)
+        return ' && '.join(parts), params
+
+    def search_available(self):
+        """Check whether the full-text index exists (SQLite builds without FTS5 have none)"""
+        if self._search_available is None:
+            if self.db.dialect == 'postgresql':
+                self._search_available = True
+            else:
+                with self.get_connection() as conn:
+                    row = conn.execute(
+                        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chat_history_fts'"
+                    ).fetchone()
+                self._search_available = row is not None
+        return self._search_available
+
+    def search(self, query, customer_id=None, agent_id=None, since=None, until=None,
+               limit=20, offset=0, snippet_tokens=12):
+        """Full-text search across all chat history, best matches first
+
+        Filters narrow by customer, agent and a [since, until) timestamp range.
+        Each hit carries a snippet with matched terms wrapped in <mark> tags.
+        Returns (hits, has_more).
+        """
+        conditions = []
+        params = []
+        if customer_id is not None:
+            conditions.append('s.customer_id = ?')
+            params.append(customer_id)
+        if agent_id is not None:
+            conditions.append('h.agent_id = ?')
+            params.append(agent_id)
+        if since is not None:
+            conditions.append('h.timestamp >= ?')
+            params.append(since)
+        if until is not None:
+            conditions.append('h.timestamp < ?')
+            params.append(until)
+        sessions_join = 'JOIN' if customer_id is not None else 'LEFT JOIN'
 
-        cursor.execute('''
-            SELECT message_type, content, agent_id, timestamp, metadata, tool_calls
-            FROM chat_history
-            WHERE session_id = ? AND agent_id = ?
-            ORDER BY timestamp ASC
-        ''', (session_id, agent_id))
+        if self.db.dialect == 'postgresql':
+            tsquery, tsquery_params = self._tsquery_expression(query)
+            if not tsquery:
+                return [], False
+            # Rank and page on ids first so snippets are only built for the returned page
+            sql = f'''
+                SELECT h.id, h.session_id, s.customer_id, h.message_type, h.agent_id, h.timestamp,
+                       ts_headline('simple', h.content, hits.query, ?), hits.rank
+                FROM (
+                    SELECT h.id, ts_rank_cd(h.content_tsv, q.query) AS rank, q.query
+                    FROM chat_history h
+                    CROSS JOIN (SELECT {tsquery} AS query) q
+                    {'JOIN sessions s ON s.id = h.session_id' if customer_id is not None else ''}
+                    WHERE {' AND '.join(['h.content_tsv @@ q.query'] + conditions)}
+                    ORDER BY rank DESC, h.id DESC
+                    LIMIT ? OFFSET ?
+                ) hits
+                JOIN chat_history h ON h.id = hits.id
+                LEFT JOIN sessions s ON s.id = h.session_id
+                ORDER BY hits.rank DESC, h.id DESC
+            '''
+            headline_options = (f'StartSel=<mark>, StopSel=</mark>, MaxWords={snippet_tokens}, '
+                                f'MinWords={max(1, snippet_tokens // 3)}, MaxFragments=1, FragmentDelimiter=…')
+            params = (headline_options, *tsquery_params, *params, limit + 1, offset)
+        else:
+            match = self._match_expression(query)
+            if not match:
+                return [], False
+            # bm25 is lower for better matches; negate it so scores grow with relevance
+            sql = f'''
+                SELECT h.id, h.session_id, s.customer_id, h.message_type, h.agent_id, h.timestamp,
+                       snippet(chat_history_fts, 0, '<mark>', '</mark>', '…', ?), -bm25(chat_history_fts)
+                FROM chat_history_fts
+                JOIN chat_history h ON h.id = chat_history_fts.rowid
+                {sessions_join} sessions s ON s.id = h.session_id
+                WHERE {' AND '.join(['chat_history_fts MATCH ?'] + conditions)}
+                ORDER BY bm25(chat_history_fts), h.id DESC
+                LIMIT ? OFFSET ?
+            '''
+            params = (snippet_tokens, match, *params, limit + 1, offset)
 
-        history = cursor.fetchall()
-        conn.close()
+        with self.get_connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
 
+        # The extra row only signals that another page exists
+        has_more = len(rows) > limit
         return [
             {
-                'type': row[0],
-                'content': row[1],
-                'agent_id': row[2],
-                'timestamp': row[3],
-                'metadata': json.loads(row[4]) if row[4] else {},
-                'tool_calls': json.loads(row[5]) if row[5] else []
+                'id': row[0],
+                'session_id': row[1],
+                'customer_id': row[2],
+                'type': row[3],
+                'agent_id': row[4],
+                'timestamp': row[5],
+                'snippet': row[6],
+                'score': row[7]
             }
-            for row in history
-        ]
+            for row in rows[:limit]
+        ], has_more
 
-    def delete_message(self, message_id):
-        """Delete a specific message"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    def get_chat_history(self, session_id, limit=100):
+        """Get chat history for a session, oldest first (limit=None for all of it)"""
+        with self.get_connection() as conn:
+            return select_rows(conn, ChatMessage, f'''
+                SELECT {ChatMessage.COLUMNS}
+                FROM chat_history
+                WHERE session_id = ?
+                ORDER BY timestamp ASC
+                {'LIMIT ?' if limit is not None else ''}
+            ''', (session_id,) if limit is None else (session_id, limit)).fetchall()
 
-        cursor.execute('DELETE FROM chat_history WHERE id = ?', (message_id,))
+    def get_chat_history_page(self, session_id, limit=50, before_id=None, after_id=None):
+        """Get one page of chat history using keyset pagination on message id
 
-        conn.commit()
-        conn.close()
+        With after_id, returns the oldest messages newer than that id (incremental
+        fetch); otherwise returns the newest messages older than before_id (or
+        the newest messages overall). Returns (messages, has_more) with messages
+        in chronological order.
+        """
+        with self.get_connection() as conn:
+            if after_id is not None:
+                rows = select_rows(conn, ChatMessage, f'''
+                    SELECT {ChatMessage.COLUMNS}
+                    FROM chat_history
+                    WHERE session_id = ? AND id > ?
+                    ORDER BY id ASC
+                    LIMIT ?
+                ''', (session_id, after_id, limit + 1)).fetchall()
+            else:
+                rows = select_rows(conn, ChatMessage, f'''
+                    SELECT {ChatMessage.COLUMNS}
+                    FROM chat_history
+                    WHERE session_id = ? AND id < ?
+                    ORDER BY id DESC
+                    LIMIT ?
+                ''', (session_id, before_id if before_id is not None else 2 ** 63 - 1, limit + 1)).fetchall()
 
-    def clear_session_history(self, session_id):
-        """Clear all chat history for a session"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        # The extra row only signals that another page exists
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if after_id is None:
+            rows.reverse()
+        return rows, has_more
 
-        cursor.execute('DELETE FROM chat_history WHERE session_id = ?', (session_id,))
+    def get_latest_messages(self, session_id, count=10):
+        """Get the latest N messages from a session, oldest first"""
+        return self.get_recent_messages(session_id, count)[::-1]
+
+    def get_recent_messages(self, session_id, count=10):
+        """Get the latest N messages from a session, newest first"""
+        with self.get_connection() as conn:
+            # Ordering by id keeps messages written within the same second in order
+            return select_rows(conn, ChatMessage, f'''
+                SELECT {ChatMessage.COLUMNS}
+                FROM chat_history
+                WHERE session_id = ?
+                ORDER BY id DESC
+                LIMIT ?
+            ''', (session_id, count)).fetchall()
+
+    def get_history_state(self, session_id):
+        """Get (message_count, last_message_id) for a session, for cache validation"""
+        with self.get_connection() as conn:
+            cursor = conn.execute(
+                'SELECT COUNT(*), MAX(id) FROM chat_history WHERE session_id = ?', (session_id,)
+            )
+            return cursor.fetchone()
 
-        conn.commit()
-        conn.close()
+    def get_message_count(self, session_id):
+        """Get total message count for a session"""
+        with self.get_connection() as conn:
+            cursor = conn.execute('SELECT COUNT(*) FROM chat_history WHERE session_id = ?', (session_id,))
+            return cursor.fetchone()[0]
+
+    def get_messages_by_agent(self, session_id, agent_id):
+        """Get all messages from a specific agent in a session"""
+        with self.get_connection() as conn:
+            return select_rows(conn, ChatMessage, f'''
+                SELECT {ChatMessage.COLUMNS}
+                FROM chat_history
+                WHERE session_id = ? AND agent_id = ?
+                ORDER BY timestamp ASC
+            ''', (session_id, agent_id)).fetchall()
+
+    def delete_message(self, message_id):
+        """Delete a specific message"""
+        with self.get_connection() as conn:
+            row = conn.execute(
+                'DELETE FROM chat_history WHERE id = ? RETURNING session_id', (message_id,)
+            ).fetchone()
+            if row:
+                # Counts cannot be decremented reliably, so recompute this session
+                SessionSummaryDAO.rebuild(conn, row[0])
+
+    def clear_session_history(self, session_id):
+        """Clear all chat history for a session"""
+        with self.get_connection() as conn:
+            conn.execute('DELETE FROM chat_history WHERE session_id = ?', (session_id,))
+            SessionSummaryDAO.delete(conn, session_id)
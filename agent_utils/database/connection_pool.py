@@ -0,0 +1,101 @@
+import sqlite3
+import queue
+import threading
+from contextlib import contextmanager
+
+
+class ConnectionPool:
+    """Thread-safe pool of reusable SQLite connections in WAL mode"""
+
+    PRAGMAS = (
+        # Lets retention reclaim free pages with incremental vacuum. Only takes
+        # effect on a new database, so it must run before journal_mode
+        # initializes the file; existing databases are unaffected
+        'PRAGMA auto_vacuum=INCREMENTAL',
+        'PRAGMA journal_mode=WAL',
+        # Truncate the WAL back to 64 MB after checkpoints so bulk deletes
+        # and vacuums don't leave a permanently oversized -wal file
+        'PRAGMA journal_size_limit=67108864',
+        'PRAGMA synchronous=NORMAL',
+        'PRAGMA temp_store=MEMORY',
+    )
+
+    def __init__(self, db_path='chat_sessions.db', max_connections=8, timeout=30.0,
+                 cache_size_kb=16384, mmap_size=268435456, cached_statements=256):
+        self.db_path = db_path
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self.cached_statements = cached_statements
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._all = []
+
+    def _connect(self):
+        """Open a new connection with the pool's pragmas applied"""
+        # sqlite3 keeps a per-connection LRU of prepared statements, so reusing
+        # connections also reuses compiled SQL
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        for pragma in self.PRAGMAS:
+            conn.execute(pragma)
+        conn.execute(f'PRAGMA busy_timeout={int(self.timeout * 1000)}')
+        conn.execute(f'PRAGMA cache_size=-{int(self.cache_size_kb)}')
+        conn.execute(f'PRAGMA mmap_size={int(self.mmap_size)}')
+        return conn
+
+    def acquire(self):
+        """Take a connection from the pool, opening one if the pool is not full"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.max_connections:
+                conn = self._connect()
+                self._created += 1
+                self._all.append(conn)
+                return conn
+
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f'No database connection available after {self.timeout}s')
+
+    def release(self, conn):
+        """Return a connection to the pool"""
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection, committing on success and rolling back on error"""
+        conn = self.acquire()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        """Close every connection opened by the pool"""
+        with self._lock:
+            for conn in self._all:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._all = []
+            self._created = 0
+            self._idle = queue.LifoQueue()
@@ -1,102 +1,89 @@
-import sqlite3
-import os
+import threading
+from .backends import create_backend
+from .migrations import MigrationRunner
+from .payload_codec import PayloadCodec
 
 
 class DatabaseManager:
-    """Manage database connections and schema initialization"""
+    """Manage database connections and schema initialization
 
-    def __init__(self, db_path='chat_sessions.db'):
-        self.db_path = db_path
+    db_path is a SQLite file path or a postgresql:// URL; the matching
+    storage backend supplies pooled connections and engine-specific schema.
+    """
+
+    _shared = {}
+    _shared_lock = threading.Lock()
 
-    def get_connection(self):
-        """Get a database connection"""
-        return sqlite3.connect(self.db_path)
+    def __init__(self, db_path='chat_sessions.db', pool_size=8, payload_codec=None, backend=None):
+        self.db_path = db_path
+        self.backend = backend or create_backend(db_path, pool_size=pool_size)
+        # Encoding for new chat_history metadata/tool_calls values; reads accept every format
+        self.payload_codec = payload_codec or PayloadCodec()
+        if self.payload_codec.encoding != 'json' and not self.backend.supports_binary_payloads:
+            # PostgreSQL already compresses large values out of line (TOAST)
+            print(f"⚠️ {self.backend.dialect} stores chat payloads as JSON text; "
+                  f"ignoring the {self.payload_codec.encoding} encoding")
+            self.payload_codec = PayloadCodec('json')
+        with DatabaseManager._shared_lock:
+            DatabaseManager._shared.setdefault(db_path, self)
+
+    @classmethod
+    def shared(cls, db_path='chat_sessions.db'):
+        """Get the process-wide manager (and its connection pool) for a database path"""
+        with cls._shared_lock:
+            manager = cls._shared.get(db_path)
+        return manager or cls(db_path)
+
+    @property
+    def dialect(self):
+        """Engine name of the backend: 'sqlite' or 'postgresql'"""
+        return self.backend.dialect
+
+    def connection(self):
+        """Borrow a pooled connection; commits on success, rolls back on error"""
+        return self.backend.connection()
+
+    def begin_write(self, conn):
+        """Start a write transaction on a borrowed connection"""
+        self.backend.begin_write(conn)
 
     def init_database(self):
         """Initialize all database tables"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
-        # Create sessions table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sessions (
-                id TEXT PRIMARY KEY,
-                customer_id TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                metadata TEXT
-            )
-        ''')
-
-        # Create chat history table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS chat_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_id TEXT NOT NULL,
-                message_type TEXT NOT NULL,
-                content TEXT NOT NULL,
-                agent_id TEXT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                metadata TEXT,
-                tool_calls TEXT,
-                FOREIGN KEY (session_id) REFERENCES sessions (id)
-            )
-        ''')
-
-        # Create agents table for multi-agent orchestration
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS agents (
-                id TEXT PRIMARY KEY,
-                name TEXT NOT NULL,
-                description TEXT,
-                tools TEXT,
-                status TEXT DEFAULT 'active',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        # Create context table for session context management
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS session_context (
-                session_id TEXT PRIMARY KEY,
-                context_data TEXT,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (session_id) REFERENCES sessions (id)
-            )
-        ''')
-
-        conn.commit()
-        conn.close()
+        with self.connection() as conn:
+            for statement in self.backend.schema:
+                conn.execute(statement)
 
-    def drop_all_tables(self):
-        """Drop all tables (useful for testing)"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        # Bring existing databases up to the current schema
+        MigrationRunner(self).upgrade()
 
-        tables = ['session_context', 'chat_history', 'agents', 'sessions']
-        for table in tables:
-            cursor.execute(f'DROP TABLE IF EXISTS {table}')
+    def get_schema_version(self):
+        """Get the currently applied schema migration version"""
+        return MigrationRunner(self).current_version()
 
-        conn.commit()
-        conn.close()
+    def drop_all_tables(self):
+        """Drop all tables (useful for testing)"""
+        with self.connection() as conn:
+            tables = ['chat_history_fts', 'session_summary', 'session_context', 'chat_history', 'agents', 'sessions', 'schema_version']
+            for table in tables:
+                conn.execute(f'DROP TABLE IF EXISTS {table}')
 
     def get_table_info(self, table_name):
         """Get information about a table structure"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            return self.backend.table_info(conn, table_name)
 
-        cursor.execute(f"PRAGMA table_info({table_name})")
-        info = cursor.fetchall()
-
-        conn.close()
-        return info
+    def get_storage_bytes(self):
+        """Get the on-disk size of the database"""
+        return self.backend.storage_bytes()
 
     def backup_database(self, backup_path):
         """Create a backup of the database"""
-        import shutil
-        shutil.copy2(self.db_path, backup_path)
+        self.backend.backup(backup_path)
 
     def restore_database(self, backup_path):
         """Restore database from backup"""
-        import shutil
-        shutil.copy2(backup_path, self.db_path)
+        self.backend.restore(backup_path)
+
+    def close(self):
+        """Close all pooled connections"""
+        self.backend.close()
@@ -0,0 +1,198 @@
+# Ordered schema migrations: (version, description, steps). Steps are SQL
+# statements or callables taking a connection; applied versions are recorded
+# in schema_version so the upgrade is idempotent. Each storage backend has its
+# own list; versions mean the same schema change in every list.
+
+import sqlite3
+
+
+def _backfill_session_summary(conn):
+    from .session_summary_dao import SessionSummaryDAO
+    SessionSummaryDAO.rebuild(conn)
+
+
+_SEARCH_INDEX_STEPS = [
+    # External-content table: the index stores only tokens and reads
+    # message text back from chat_history, so content is not duplicated
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS chat_history_fts USING fts5(
+        content,
+        content='chat_history',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS chat_history_fts_insert AFTER INSERT ON chat_history BEGIN
+        INSERT INTO chat_history_fts (rowid, content) VALUES (new.id, new.content);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS chat_history_fts_delete AFTER DELETE ON chat_history BEGIN
+        INSERT INTO chat_history_fts (chat_history_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS chat_history_fts_update AFTER UPDATE OF content ON chat_history BEGIN
+        INSERT INTO chat_history_fts (chat_history_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO chat_history_fts (rowid, content) VALUES (new.id, new.content);
+    END
+    ''',
+    # Index the rows written before the triggers existed
+    "INSERT INTO chat_history_fts (chat_history_fts) VALUES ('rebuild')",
+]
+
+
+def _fts5_available(conn):
+    """Check whether this SQLite build can create FTS5 tables"""
+    try:
+        conn.execute('CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(content)')
+    except sqlite3.OperationalError:
+        return False
+    conn.execute('DROP TABLE temp.fts5_probe')
+    return True
+
+
+def _create_search_index(conn):
+    # Search is optional: without FTS5 the app still starts and /api/search
+    # reports it as unavailable
+    if not _fts5_available(conn):
+        print("⚠️ SQLite was built without FTS5; full-text search is disabled")
+        return
+    for step in _SEARCH_INDEX_STEPS:
+        conn.execute(step)
+
+
+MIGRATIONS = [
+    (1, 'Index chat history and session lookups', [
+        'CREATE INDEX IF NOT EXISTS idx_chat_history_session_ts ON chat_history (session_id, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_chat_history_session_agent_ts ON chat_history (session_id, agent_id, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_sessions_customer_created ON sessions (customer_id, created_at)',
+    ]),
+    (2, 'Track session context versions for stale cache detection', [
+        'ALTER TABLE session_context ADD COLUMN version INTEGER NOT NULL DEFAULT 0',
+    ]),
+    (3, 'Index chat history by session and message id for keyset pagination', [
+        'CREATE INDEX IF NOT EXISTS idx_chat_history_session_id ON chat_history (session_id, id)',
+    ]),
+    (4, 'Add incrementally maintained per-session analytics', [
+        '''
+        CREATE TABLE IF NOT EXISTS session_summary (
+            session_id TEXT PRIMARY KEY,
+            message_count INTEGER NOT NULL DEFAULT 0,
+            agent_counts TEXT NOT NULL DEFAULT '{}',
+            tool_counts TEXT NOT NULL DEFAULT '{}',
+            timeline TEXT NOT NULL DEFAULT '[]',
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        _backfill_session_summary,
+    ]),
+    (5, 'Index chat history by time for date-range exports', [
+        'CREATE INDEX IF NOT EXISTS idx_chat_history_timestamp ON chat_history (timestamp)',
+    ]),
+    (6, 'Add a full-text search index over chat history', [
+        _create_search_index,
+    ]),
+]
+
+POSTGRES_MIGRATIONS = [
+    (1, 'Index chat history and session lookups', [
+        'CREATE INDEX IF NOT EXISTS idx_chat_history_session_ts ON chat_history (session_id, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_chat_history_session_agent_ts ON chat_history (session_id, agent_id, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_sessions_customer_created ON sessions (customer_id, created_at)',
+    ]),
+    (2, 'Track session context versions for stale cache detection', [
+        'ALTER TABLE session_context ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 0',
+    ]),
+    (3, 'Index chat history by session and message id for keyset pagination', [
+        'CREATE INDEX IF NOT EXISTS idx_chat_history_session_id ON chat_history (session_id, id)',
+    ]),
+    (4, 'Add incrementally maintained per-session analytics', [
+        '''
+        CREATE TABLE IF NOT EXISTS session_summary (
+            session_id TEXT PRIMARY KEY,
+            message_count INTEGER NOT NULL DEFAULT 0,
+            agent_counts TEXT NOT NULL DEFAULT '{}',
+            tool_counts TEXT NOT NULL DEFAULT '{}',
+            timeline TEXT NOT NULL DEFAULT '[]',
+            updated_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        _backfill_session_summary,
+    ]),
+    (5, 'Index chat history by time for date-range exports', [
+        'CREATE INDEX IF NOT EXISTS idx_chat_history_timestamp ON chat_history (timestamp)',
+    ]),
+    (6, 'Add a full-text search index over chat history', [
+        # A stored generated column is filled for existing rows when added and
+        # kept current on every write, so no triggers or backfill are needed
+        '''
+        ALTER TABLE chat_history ADD COLUMN IF NOT EXISTS content_tsv tsvector
+            GENERATED ALWAYS AS (to_tsvector('simple', content)) STORED
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_chat_history_content_tsv ON chat_history USING GIN (content_tsv)',
+    ]),
+]
+
+
+class MigrationRunner:
+    """Apply pending schema migrations in order"""
+
+    def __init__(self, db_manager, migrations=None):
+        self.db = db_manager
+        self.migrations = sorted(migrations or db_manager.backend.migrations, key=lambda migration: migration[0])
+
+    def _ensure_version_table(self, conn):
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+    def _current_version(self, conn):
+        row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+        return row[0] or 0
+
+    def current_version(self):
+        """Get the highest applied migration version"""
+        with self.db.connection() as conn:
+            self._ensure_version_table(conn)
+            return self._current_version(conn)
+
+    def upgrade(self):
+        """Apply all pending migrations, returning the versions applied"""
+        applied = []
+        with self.db.connection() as conn:
+            self._ensure_version_table(conn)
+            conn.commit()
+
+            for version, description, steps in self.migrations:
+                # Take the write lock before re-checking the version, so
+                # concurrent workers never apply a migration twice
+                self.db.backend.begin_exclusive(conn)
+                try:
+                    if version <= self._current_version(conn):
+                        conn.rollback()
+                        continue
+                    for step in steps:
+                        if callable(step):
+                            step(conn)
+                        else:
+                            conn.execute(step)
+                    conn.execute(
+                        'INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                        (version, description)
+                    )
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+
+                print(f"🗄️ Applied migration {version}: {description}")
+                applied.append(version)
+
+        return applied
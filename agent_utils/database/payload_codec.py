@@ -0,0 +1,59 @@
+import json
+import zlib
+
+try:
+    import msgpack
+except ImportError:  # msgpack is only needed when the msgpack encoding is selected
+    msgpack = None
+
+# chat_history.metadata and tool_calls hold either JSON text (the original
+# format, still used for small values) or a BLOB whose first byte names its
+# encoding, so rows in every format can be read without a separate tag column
+TAG_ZLIB_JSON = 0x01
+TAG_MSGPACK = 0x02
+
+ENCODINGS = ('json', 'zlib', 'msgpack')
+
+
+def decode_payload(raw, default=None):
+    """Decode a stored metadata/tool_calls value in any supported format"""
+    if not raw:
+        return default
+    if isinstance(raw, str):
+        return json.loads(raw)
+    tag = raw[0]
+    if tag == TAG_ZLIB_JSON:
+        return json.loads(zlib.decompress(raw[1:]))
+    if tag == TAG_MSGPACK:
+        if msgpack is None:
+            raise ImportError("Decoding msgpack chat payloads requires msgpack (pip install msgpack)")
+        return msgpack.unpackb(raw[1:], raw=False)
+    raise ValueError(f"Unknown chat payload encoding tag {tag:#04x}")
+
+
+class PayloadCodec:
+    """Encode chat_history metadata and tool_calls for storage
+
+    Values whose JSON is shorter than min_bytes stay plain JSON text: the
+    common '{}' and '[]' would only grow with a tag and a compression header.
+    """
+
+    def __init__(self, encoding='json', min_bytes=256, level=6):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown chat payload encoding '{encoding}' (expected one of {', '.join(ENCODINGS)})")
+        if encoding == 'msgpack' and msgpack is None:
+            raise ImportError("The msgpack chat payload encoding requires msgpack (pip install msgpack)")
+        self.encoding = encoding
+        self.min_bytes = min_bytes
+        self.level = level
+
+    def encode(self, value):
+        """Encode a value for the metadata or tool_calls column"""
+        text = json.dumps(value, separators=(',', ':'), default=str)
+        if self.encoding == 'json' or len(text) < self.min_bytes:
+            return text
+        if self.encoding == 'msgpack':
+            # Round-trip through JSON first so msgpack sees the same types json.dumps accepted
+            return bytes([TAG_MSGPACK]) + msgpack.packb(json.loads(text), use_bin_type=True)
+        return bytes([TAG_ZLIB_JSON]) + zlib.compress(text.encode('utf-8'), self.level)
+
@@ -0,0 +1,274 @@
+import queue
+import re
+import threading
+import uuid
+from contextlib import contextmanager
+from .backends import StorageBackend
+from .migrations import POSTGRES_MIGRATIONS
+
+try:
+    import psycopg
+    from psycopg.pq import TransactionStatus
+    from psycopg.types.string import TextLoader
+except ImportError:  # psycopg is only needed when a PostgreSQL database is configured
+    psycopg = None
+
+# String literals pass through (with % escaped); bare ? and % are rewritten
+_PARAM_RE = re.compile(r"'(?:[^']|'')*'|\?|%")
+
+
+def translate_sql(sql):
+    """Rewrite sqlite3-style SQL (? placeholders) for psycopg (%s placeholders)"""
+    def replace(match):
+        token = match.group(0)
+        if token == '?':
+            return '%s'
+        return token.replace('%', '%%')
+    return _PARAM_RE.sub(replace, sql)
+
+
+class PostgresCursor:
+    """A psycopg cursor that accepts ? placeholders and sqlite3-style row factories"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        # Same contract as sqlite3: row_factory(cursor, row) -> object
+        self.row_factory = None
+
+    def execute(self, sql, params=()):
+        if self.row_factory is not None:
+            factory = self.row_factory
+            self.raw.row_factory = lambda cursor: lambda values: factory(cursor, values)
+        self.raw.execute(translate_sql(sql), tuple(params))
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self.raw.executemany(translate_sql(sql), (tuple(params) for params in seq_of_params))
+        return self
+
+    @property
+    def rowcount(self):
+        return self.raw.rowcount
+
+    def fetchone(self):
+        return self.raw.fetchone()
+
+    def fetchall(self):
+        return self.raw.fetchall()
+
+    def __iter__(self):
+        return iter(self.raw)
+
+
+class PostgresConnection:
+    """Wrap a psycopg connection in the subset of the sqlite3.Connection API the DAOs use"""
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    def cursor(self):
+        return PostgresCursor(self.raw.cursor())
+
+    def streaming_cursor(self, itersize=2000):
+        """A server-side cursor that fetches itersize rows per round trip while iterated"""
+        cursor = self.raw.cursor(name=f"stream_{uuid.uuid4().hex}")
+        cursor.itersize = itersize
+        return PostgresCursor(cursor)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    @property
+    def in_transaction(self):
+        return self.raw.info.transaction_status != TransactionStatus.IDLE
+
+    @property
+    def broken(self):
+        return self.raw.closed or self.raw.info.transaction_status == TransactionStatus.UNKNOWN
+
+
+class PostgresConnectionPool:
+    """Thread-safe pool of reusable PostgreSQL connections
+
+    Mirrors ConnectionPool: connections open lazily up to max_connections
+    and are handed out most-recently-used first. Sessions run in UTC with
+    timestamps returned as 'YYYY-MM-DD HH:MM:SS' strings, matching what
+    SQLite's CURRENT_TIMESTAMP stores.
+    """
+
+    def __init__(self, url, max_connections=8, timeout=30.0):
+        self.url = url
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._all = []
+
+    def _connect(self):
+        raw = psycopg.connect(self.url, options='-c TimeZone=UTC', connect_timeout=int(self.timeout))
+        raw.adapters.register_loader('timestamp', TextLoader)
+        return PostgresConnection(raw)
+
+    def acquire(self):
+        """Take a connection from the pool, opening one if the pool is not full"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.max_connections:
+                self._created += 1
+                try:
+                    conn = self._connect()
+                except Exception:
+                    self._created -= 1
+                    raise
+                self._all.append(conn)
+                return conn
+
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f'No database connection available after {self.timeout}s')
+
+    def release(self, conn):
+        """Return a connection to the pool, replacing it if the server dropped it"""
+        if conn.broken:
+            with self._lock:
+                self._created -= 1
+                if conn in self._all:
+                    self._all.remove(conn)
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection, committing on success and rolling back on error"""
+        conn = self.acquire()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            if not conn.broken:
+                conn.rollback()
+            raise
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        """Close every connection opened by the pool"""
+        with self._lock:
+            for conn in self._all:
+                try:
+                    conn.raw.close()
+                except psycopg.Error:
+                    pass
+            self._all = []
+            self._created = 0
+            self._idle = queue.LifoQueue()
+
+
+class PostgresBackend(StorageBackend):
+    """Shared storage in PostgreSQL, so several app nodes can serve the same sessions
+
+    Foreign keys are not declared, as under SQLite (which does not enforce
+    them by default): deletes run parent-first and the retention job
+    removes orphans. Large metadata/tool_calls values are compressed by
+    TOAST, so they are always stored as JSON text.
+    """
+
+    dialect = 'postgresql'
+    supports_binary_payloads = False
+    migrations = POSTGRES_MIGRATIONS
+
+    schema = [
+        '''
+        CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            customer_id TEXT NOT NULL,
+            created_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP,
+            metadata TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS chat_history (
+            id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            session_id TEXT NOT NULL,
+            message_type TEXT NOT NULL,
+            content TEXT NOT NULL,
+            agent_id TEXT,
+            timestamp TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP,
+            metadata TEXT,
+            tool_calls TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS agents (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            description TEXT,
+            tools TEXT,
+            status TEXT DEFAULT 'active',
+            created_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS session_context (
+            session_id TEXT PRIMARY KEY,
+            context_data TEXT,
+            updated_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+    ]
+
+    def __init__(self, url, pool_size=8):
+        if psycopg is None:
+            raise ImportError("PostgreSQL storage requires psycopg (pip install 'psycopg[binary]')")
+        self.url = url
+        self.pool = PostgresConnectionPool(url, max_connections=pool_size)
+
+    def connection(self):
+        return self.pool.connection()
+
+    def begin_write(self, conn):
+        # Row locks taken by the statements themselves are enough
+        pass
+
+    def begin_exclusive(self, conn):
+        conn.execute('LOCK TABLE schema_version IN EXCLUSIVE MODE')
+
+    def table_info(self, conn, table_name):
+        return conn.execute('''
+            SELECT c.ordinal_position - 1, c.column_name, c.data_type, c.is_nullable = 'NO', c.column_default,
+                   EXISTS (
+                       SELECT 1 FROM information_schema.table_constraints t
+                       JOIN information_schema.key_column_usage k
+                         ON k.constraint_name = t.constraint_name AND k.table_name = t.table_name
+                       WHERE t.table_name = c.table_name AND t.constraint_type = 'PRIMARY KEY'
+                         AND k.column_name = c.column_name
+                   )::int
+            FROM information_schema.columns c
+            WHERE c.table_schema = current_schema() AND c.table_name = ?
+            ORDER BY c.ordinal_position
+        ''', (table_name,)).fetchall()
+
+    def storage_bytes(self):
+        with self.connection() as conn:
+            return conn.execute('SELECT pg_database_size(current_database())').fetchone()[0]
+
+    def close(self):
+        self.pool.close_all()
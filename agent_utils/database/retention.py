@@ -0,0 +1,217 @@
+import gzip
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from .database_manager import DatabaseManager
+from .rows import ChatMessage, Session, select_rows
+
+
+class RetentionManager:
+    """Archive and delete inactive sessions, clean orphaned rows and reclaim free pages
+
+    Sessions whose newest message (or creation, if empty) is older than
+    max_age_days are written to a gzip JSON Lines file in the same record
+    format as ChatArchive, so `import-history` restores them, and then deleted
+    with their messages, context and summary. Each batch is read from a WAL
+    snapshot without locks; only the delete takes the write lock, briefly.
+    """
+
+    def __init__(self, db_path='chat_sessions.db', db_manager=None, archive_dir='archives',
+                 max_age_days=90, batch_size=200, vacuum_step_pages=1024):
+        self.db = db_manager or DatabaseManager.shared(db_path)
+        self.archive_dir = archive_dir
+        self.max_age_days = max_age_days
+        self.batch_size = batch_size
+        self.vacuum_step_pages = vacuum_step_pages
+
+    def run(self, max_sessions=None, vacuum=True):
+        """Run one retention pass and report what it did"""
+        started = time.monotonic()
+        report = {
+            'cutoff': None,
+            'sessions_archived': 0,
+            'messages_archived': 0,
+            'contexts_deleted': 0,
+            'summaries_deleted': 0,
+            'archive_path': None,
+            'archive_bytes': 0,
+            'pages_freed': 0,
+            'bytes_reclaimed': 0,
+        }
+        file_bytes_before = self._file_bytes()
+
+        if self.max_age_days:
+            report.update(self.archive_inactive_sessions(max_sessions))
+        report.update(self.clean_orphans())
+        if vacuum:
+            report.update(self.incremental_vacuum())
+
+        report['file_bytes_before'] = file_bytes_before
+        report['file_bytes_after'] = self._file_bytes()
+        report['seconds'] = round(time.monotonic() - started, 3)
+        return report
+
+    def archive_inactive_sessions(self, max_sessions=None):
+        """Move sessions inactive for max_age_days into a compressed archive file"""
+        cutoff = (datetime.utcnow() - timedelta(days=self.max_age_days)).strftime('%Y-%m-%d %H:%M:%S')
+        result = {'cutoff': cutoff, 'sessions_archived': 0, 'messages_archived': 0,
+                  'archive_path': None, 'archive_bytes': 0}
+
+        raw, archive = None, None
+        try:
+            while max_sessions is None or result['sessions_archived'] < max_sessions:
+                limit = self.batch_size
+                if max_sessions is not None:
+                    limit = min(limit, max_sessions - result['sessions_archived'])
+
+                with self.db.connection() as conn:
+                    session_ids = [row[0] for row in conn.execute('''
+                        SELECT s.id FROM sessions s
+                        WHERE s.created_at < ?
+                          AND NOT EXISTS (
+                              SELECT 1 FROM chat_history h
+                              WHERE h.session_id = s.id AND h.timestamp >= ?
+                          )
+                        ORDER BY s.created_at
+                        LIMIT ?
+                    ''', (cutoff, cutoff, limit))]
+                    if not session_ids:
+                        break
+
+                    if archive is None:
+                        os.makedirs(self.archive_dir, exist_ok=True)
+                        result['archive_path'] = os.path.join(
+                            self.archive_dir, f"chat_archive_{datetime.utcnow():%Y%m%dT%H%M%S}.jsonl.gz"
+                        )
+                        raw = open(result['archive_path'], 'wb')
+                        archive = gzip.open(raw, 'wt', encoding='utf-8')
+                    self._write_batch(conn, session_ids, archive)
+
+                # The archive must be durable before the rows it holds are deleted
+                archive.flush()
+                raw.flush()
+                os.fsync(raw.fileno())
+
+                sessions, messages = self._delete_batch(session_ids, cutoff)
+                result['sessions_archived'] += sessions
+                result['messages_archived'] += messages
+        finally:
+            if archive is not None:
+                archive.close()
+                raw.close()
+                result['archive_bytes'] = os.path.getsize(result['archive_path'])
+        return result
+
+    @staticmethod
+    def _write_batch(conn, session_ids, archive):
+        placeholders = ','.join('?' * len(session_ids))
+        for session in select_rows(conn, Session, f'''
+            SELECT {Session.COLUMNS}
+            FROM sessions WHERE id IN ({placeholders})
+        ''', session_ids):
+            archive.write(json.dumps({'kind': 'session', **session.to_dict()}, separators=(',', ':')) + '\n')
+
+        for message in select_rows(conn, ChatMessage, f'''
+            SELECT {ChatMessage.COLUMNS}
+            FROM chat_history WHERE session_id IN ({placeholders})
+            ORDER BY session_id, id
+        ''', session_ids):
+            archive.write(json.dumps({'kind': 'message', **message.to_dict()}, separators=(',', ':')) + '\n')
+
+    def _delete_batch(self, session_ids, cutoff):
+        """Delete archived sessions that are still inactive, returning (sessions, messages) deleted"""
+        placeholders = ','.join('?' * len(session_ids))
+        with self.db.connection() as conn:
+            self.db.begin_write(conn)
+            # A session that received a message since it was archived stays live
+            deleted = [row[0] for row in conn.execute(f'''
+                DELETE FROM sessions
+                WHERE id IN ({placeholders})
+                  AND NOT EXISTS (
+                      SELECT 1 FROM chat_history h
+                      WHERE h.session_id = sessions.id AND h.timestamp >= ?
+                  )
+                RETURNING id
+            ''', (*session_ids, cutoff))]
+            if not deleted:
+                return 0, 0
+
+            placeholders = ','.join('?' * len(deleted))
+            messages = conn.execute(
+                f'DELETE FROM chat_history WHERE session_id IN ({placeholders})', deleted
+            ).rowcount
+            conn.execute(f'DELETE FROM session_context WHERE session_id IN ({placeholders})', deleted)
+            conn.execute(f'DELETE FROM session_summary WHERE session_id IN ({placeholders})', deleted)
+        return len(deleted), messages
+
+    def clean_orphans(self):
+        """Delete session_context and session_summary rows whose session no longer exists"""
+        result = {}
+        for table, key in (('session_context', 'contexts_deleted'), ('session_summary', 'summaries_deleted')):
+            total = 0
+            while True:
+                # Small batches keep each write transaction short
+                with self.db.connection() as conn:
+                    deleted = conn.execute(f'''
+                        DELETE FROM {table} WHERE session_id IN (
+                            SELECT t.session_id FROM {table} t
+                            LEFT JOIN sessions s ON s.id = t.session_id
+                            WHERE s.id IS NULL
+                            LIMIT ?
+                        )
+                    ''', (self.batch_size,)).rowcount
+                total += deleted
+                if deleted < self.batch_size:
+                    break
+            result[key] = total
+        return result
+
+    def incremental_vacuum(self, max_steps=None):
+        """Return free pages to the filesystem a few at a time
+
+        Each step is its own short write transaction, so live writers only
+        ever wait for one step. Requires auto_vacuum=INCREMENTAL; databases
+        created before it was enabled need a one-off enable_incremental_vacuum().
+        PostgreSQL reclaims space with autovacuum, so this is a no-op there.
+        """
+        if self.db.dialect != 'sqlite':
+            return {'pages_freed': 0, 'bytes_reclaimed': 0}
+
+        with self.db.connection() as conn:
+            if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                print("⚠️ auto_vacuum is not INCREMENTAL; run enable_incremental_vacuum() once to reclaim space")
+                return {'pages_freed': 0, 'bytes_reclaimed': 0}
+            page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+            pages_before = conn.execute('PRAGMA page_count').fetchone()[0]
+
+        steps = 0
+        while max_steps is None or steps < max_steps:
+            with self.db.connection() as conn:
+                if not conn.execute('PRAGMA freelist_count').fetchone()[0]:
+                    break
+                conn.execute(f'PRAGMA incremental_vacuum({int(self.vacuum_step_pages)})').fetchall()
+            steps += 1
+
+        with self.db.connection() as conn:
+            pages_after = conn.execute('PRAGMA page_count').fetchone()[0]
+            # PASSIVE never waits on readers or writers; the file shrinks once
+            # the WAL is checkpointed past the truncation
+            conn.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchall()
+
+        pages_freed = max(0, pages_before - pages_after)
+        return {'pages_freed': pages_freed, 'bytes_reclaimed': pages_freed * page_size}
+
+    def enable_incremental_vacuum(self):
+        """Switch an existing database to auto_vacuum=INCREMENTAL (runs a full, blocking VACUUM)"""
+        if self.db.dialect != 'sqlite':
+            print(f"⚠️ Incremental vacuum only applies to SQLite; {self.db.dialect} uses autovacuum")
+            return
+        with self.db.connection() as conn:
+            conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            conn.commit()
+            conn.execute('VACUUM')
+
+    def _file_bytes(self):
+        """Size of the database on disk"""
+        return self.db.get_storage_bytes()
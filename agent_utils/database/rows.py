@@ -0,0 +1,121 @@
+import json
+from .payload_codec import decode_payload
+
+# Marks a JSON column that has not been decoded yet
+_UNDECODED = object()
+
+
+class ChatMessage:
+    """One chat_history row, built directly by the cursor's row_factory
+
+    Slotted, so a page of messages costs one small object per row instead of
+    a dict, and metadata/tool_calls are decoded only when first read, so
+    callers that never touch tool results never decompress them.
+    """
+
+    __slots__ = ('id', 'session_id', 'type', 'content', 'agent_id', 'timestamp',
+                 '_raw_metadata', '_raw_tool_calls', '_metadata', '_tool_calls')
+
+    # Column order expected by the constructor; every SELECT of messages uses it
+    COLUMNS = 'id, session_id, message_type, content, agent_id, timestamp, metadata, tool_calls'
+
+    def __init__(self, id, session_id, type, content, agent_id=None, timestamp=None,
+                 metadata=None, tool_calls=None):
+        self.id = id
+        self.session_id = session_id
+        self.type = type
+        self.content = content
+        self.agent_id = agent_id
+        self.timestamp = timestamp
+        self._raw_metadata = metadata
+        self._raw_tool_calls = tool_calls
+        self._metadata = _UNDECODED
+        self._tool_calls = _UNDECODED
+
+    @staticmethod
+    def row_factory(cursor, row):
+        return ChatMessage(*row)
+
+    @property
+    def metadata(self):
+        if self._metadata is _UNDECODED:
+            self._metadata = decode_payload(self._raw_metadata, None) or {}
+            self._raw_metadata = None
+        return self._metadata
+
+    @property
+    def tool_calls(self):
+        if self._tool_calls is _UNDECODED:
+            self._tool_calls = decode_payload(self._raw_tool_calls, None) or []
+            self._raw_tool_calls = None
+        return self._tool_calls
+
+    def to_dict(self):
+        """The message as a JSON-ready dict, in the shape the API and archives use"""
+        return {
+            'id': self.id,
+            'session_id': self.session_id,
+            'type': self.type,
+            'content': self.content,
+            'agent_id': self.agent_id,
+            'timestamp': self.timestamp,
+            'metadata': self.metadata,
+            'tool_calls': self.tool_calls
+        }
+
+    def __repr__(self):
+        return f"ChatMessage(id={self.id!r}, session_id={self.session_id!r}, type={self.type!r})"
+
+
+class Session:
+    """One sessions row, built directly by the cursor's row_factory"""
+
+    __slots__ = ('id', 'customer_id', 'created_at', 'updated_at', '_raw_metadata', '_metadata')
+
+    COLUMNS = 'id, customer_id, created_at, updated_at, metadata'
+
+    def __init__(self, id, customer_id, created_at=None, updated_at=None, metadata=None):
+        self.id = id
+        self.customer_id = customer_id
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self._raw_metadata = metadata
+        self._metadata = _UNDECODED
+
+    @staticmethod
+    def row_factory(cursor, row):
+        return Session(*row)
+
+    @property
+    def metadata(self):
+        if self._metadata is _UNDECODED:
+            self._metadata = json.loads(self._raw_metadata) if self._raw_metadata else {}
+            self._raw_metadata = None
+        return self._metadata
+
+    def to_dict(self):
+        """The session as a JSON-ready dict, in the shape the API and archives use"""
+        return {
+            'id': self.id,
+            'customer_id': self.customer_id,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
+            'metadata': self.metadata
+        }
+
+    def __repr__(self):
+        return f"Session(id={self.id!r}, customer_id={self.customer_id!r})"
+
+
+def select_rows(conn, row_type, sql, params=(), stream=False):
+    """Run a query whose columns are row_type.COLUMNS, yielding row_type instances
+
+    The row_factory is set on a fresh cursor rather than the pooled
+    connection, so other users of the connection still get plain tuples.
+    With stream, backends that buffer results client-side use a server-side
+    cursor instead (SQLite cursors already step through rows lazily).
+    """
+    streaming_cursor = getattr(conn, 'streaming_cursor', None) if stream else None
+    cursor = streaming_cursor() if streaming_cursor else conn.cursor()
+    cursor.row_factory = row_type.row_factory
+    return cursor.execute(sql, params)
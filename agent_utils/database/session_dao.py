@@ -1,101 +1,117 @@
-import sqlite3
 import json
 import uuid
 from datetime import datetime
+from .database_manager import DatabaseManager
+from .session_summary_dao import SessionSummaryDAO
+from .rows import Session, select_rows
 
 
 class SessionDAO:
     """Data Access Object for session operations"""
 
-    def __init__(self, db_path='chat_sessions.db'):
+    def __init__(self, db_path='chat_sessions.db', db_manager=None):
         self.db_path = db_path
+        self.db = db_manager or DatabaseManager.shared(db_path)
 
     def get_connection(self):
-        """Get database connection"""
-        return sqlite3.connect(self.db_path)
+        """Borrow a pooled database connection"""
+        return self.db.connection()
 
     def create_session(self, customer_id, metadata=None):
         """Create a new chat session"""
         session_id = str(uuid.uuid4())
-        conn = self.get_connection()
-        cursor = conn.cursor()
 
-        cursor.execute('''
-            INSERT INTO sessions (id, customer_id, metadata)
-            VALUES (?, ?, ?)
-        ''', (session_id, customer_id, json.dumps(metadata or {})))
-
-        conn.commit()
-        conn.close()
+        with self.get_connection() as conn:
+            conn.execute('''
+                INSERT INTO sessions (id, customer_id, metadata)
+                VALUES (?, ?, ?)
+            ''', (session_id, customer_id, json.dumps(metadata or {})))
 
         return session_id
 
-    def get_session(self, session_id):
-        """Get session details by ID"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute('SELECT * FROM sessions WHERE id = ?', (session_id,))
-        session = cursor.fetchone()
+    def add_sessions_bulk(self, sessions):
+        """Insert many sessions in a single transaction, skipping ids that already exist
+
+        sessions is an iterable of dicts with id, customer_id and optionally
+        created_at, updated_at and metadata. Returns the number inserted.
+        """
+        rows = (
+            (session['id'], session['customer_id'], session.get('created_at'),
+             session.get('updated_at'), json.dumps(session.get('metadata') or {}))
+            for session in sessions
+        )
+        with self.get_connection() as conn:
+            cursor = conn.executemany('''
+                INSERT INTO sessions (id, customer_id, created_at, updated_at, metadata)
+                VALUES (?, ?, COALESCE(?, CURRENT_TIMESTAMP), COALESCE(?, CURRENT_TIMESTAMP), ?)
+                ON CONFLICT (id) DO NOTHING
+            ''', rows)
+            return cursor.rowcount
+
+    def iter_sessions(self, customer_id=None, since=None, until=None):
+        """Stream Session rows by creation time, optionally filtered by customer and [since, until)"""
+        conditions = []
+        params = []
+        if customer_id is not None:
+            conditions.append('customer_id = ?')
+            params.append(customer_id)
+        if since is not None:
+            conditions.append('created_at >= ?')
+            params.append(since)
+        if until is not None:
+            conditions.append('created_at < ?')
+            params.append(until)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        with self.get_connection() as conn:
+            yield from select_rows(conn, Session, f'''
+                SELECT {Session.COLUMNS}
+                FROM sessions
+                {where}
+                ORDER BY created_at, id
+            ''', params, stream=True)
 
-        conn.close()
-        return session
+    def get_session(self, session_id):
+        """Get session details by ID, or None"""
+        with self.get_connection() as conn:
+            return select_rows(conn, Session, f'SELECT {Session.COLUMNS} FROM sessions WHERE id = ?',
+                               (session_id,)).fetchone()
 
     def get_sessions_by_customer(self, customer_id, limit=10):
         """Get all sessions for a customer"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT * FROM sessions 
-            WHERE customer_id = ? 
-            ORDER BY created_at DESC 
-            LIMIT ?
-        ''', (customer_id, limit))
-
-        sessions = cursor.fetchall()
-        conn.close()
-        return sessions
+        with self.get_connection() as conn:
+            return select_rows(conn, Session, f'''
+                SELECT {Session.COLUMNS}
+                FROM sessions
+                WHERE customer_id = ?
+                ORDER BY created_at DESC
+                LIMIT ?
+            ''', (customer_id, limit)).fetchall()
 
     def update_session_metadata(self, session_id, metadata):
         """Update session metadata"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            UPDATE sessions 
-            SET metadata = ?, updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        ''', (json.dumps(metadata), session_id))
-
-        conn.commit()
-        conn.close()
+        with self.get_connection() as conn:
+            conn.execute('''
+                UPDATE sessions 
+                SET metadata = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (json.dumps(metadata), session_id))
 
     def delete_session(self, session_id):
         """Delete a session and all related data"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
-        # Delete in order due to foreign key constraints
-        cursor.execute('DELETE FROM session_context WHERE session_id = ?', (session_id,))
-        cursor.execute('DELETE FROM chat_history WHERE session_id = ?', (session_id,))
-        cursor.execute('DELETE FROM sessions WHERE id = ?', (session_id,))
-
-        conn.commit()
-        conn.close()
+        with self.get_connection() as conn:
+            # Delete in order due to foreign key constraints
+            conn.execute('DELETE FROM session_context WHERE session_id = ?', (session_id,))
+            conn.execute('DELETE FROM chat_history WHERE session_id = ?', (session_id,))
+            conn.execute('DELETE FROM sessions WHERE id = ?', (session_id,))
+            SessionSummaryDAO.delete(conn, session_id)
 
     def get_all_sessions(self, limit=50):
         """Get all sessions (for admin purposes)"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT id, customer_id, created_at, updated_at 
-            FROM sessions 
-            ORDER BY created_at DESC 
-            LIMIT ?
-        ''', (limit,))
-
-        sessions = cursor.fetchall()
-        conn.close()
-        return sessions
+        with self.get_connection() as conn:
+            return select_rows(conn, Session, f'''
+                SELECT {Session.COLUMNS}
+                FROM sessions
+                ORDER BY created_at DESC
+                LIMIT ?
+            ''', (limit,)).fetchall()
@@ -0,0 +1,160 @@
+import json
+from .database_manager import DatabaseManager
+from .payload_codec import decode_payload
+
+# Timeline buckets are per minute; only the most recent ones are kept so a
+# summary row stays small however long the session runs
+TIMELINE_BUCKETS = 240
+
+
+class SessionSummaryDAO:
+    """Data Access Object for incrementally maintained per-session analytics"""
+
+    def __init__(self, db_path='chat_sessions.db', db_manager=None):
+        self.db_path = db_path
+        self.db = db_manager or DatabaseManager.shared(db_path)
+
+    def get_summary(self, session_id):
+        """Get the aggregated message, agent, tool and timeline counts for a session"""
+        with self.db.connection() as conn:
+            summary = self._load(conn, session_id)
+        summary['session_id'] = session_id
+        return summary
+
+    @staticmethod
+    def _empty():
+        return {'message_count': 0, 'agent_counts': {}, 'tool_counts': {}, 'timeline': []}
+
+    @staticmethod
+    def _load(conn, session_id):
+        row = conn.execute('''
+            SELECT message_count, agent_counts, tool_counts, timeline
+            FROM session_summary
+            WHERE session_id = ?
+        ''', (session_id,)).fetchone()
+        if not row:
+            return SessionSummaryDAO._empty()
+        return {
+            'message_count': row[0],
+            'agent_counts': json.loads(row[1]),
+            'tool_counts': json.loads(row[2]),
+            'timeline': json.loads(row[3])
+        }
+
+    @staticmethod
+    def _lock(conn, session_id):
+        """Create the summary row if needed and lock it until the caller's transaction ends
+
+        The no-op upsert takes a row lock on PostgreSQL, so writers on other
+        nodes wait here instead of folding into the same stale copy and
+        losing an update. SQLite already serializes write transactions.
+        """
+        conn.execute('''
+            INSERT INTO session_summary (session_id) VALUES (?)
+            ON CONFLICT (session_id) DO UPDATE SET session_id = excluded.session_id
+        ''', (session_id,))
+
+    @staticmethod
+    def _store(conn, session_id, summary):
+        conn.execute('''
+            INSERT INTO session_summary
+                (session_id, message_count, agent_counts, tool_counts, timeline, updated_at)
+            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT (session_id) DO UPDATE SET
+                message_count = excluded.message_count,
+                agent_counts = excluded.agent_counts,
+                tool_counts = excluded.tool_counts,
+                timeline = excluded.timeline,
+                updated_at = excluded.updated_at
+        ''', (session_id, summary['message_count'], json.dumps(summary['agent_counts']),
+              json.dumps(summary['tool_counts']), json.dumps(summary['timeline'])))
+
+    @staticmethod
+    def _fold(summary, message_type, agent_id, tool_calls, timestamp):
+        """Add one message to an in-memory summary"""
+        tools = [call['tool'] for call in tool_calls or [] if isinstance(call, dict) and call.get('tool')]
+
+        summary['message_count'] += 1
+        if agent_id:
+            summary['agent_counts'][agent_id] = summary['agent_counts'].get(agent_id, 0) + 1
+        for tool in tools:
+            summary['tool_counts'][tool] = summary['tool_counts'].get(tool, 0) + 1
+
+        bucket_key = str(timestamp)[:16]
+        timeline = summary['timeline']
+        if not timeline or timeline[-1]['bucket'] != bucket_key:
+            timeline.append({'bucket': bucket_key, 'messages': 0, 'tool_calls': 0, 'types': {}, 'agents': {}})
+            del timeline[:-TIMELINE_BUCKETS]
+        bucket = timeline[-1]
+        bucket['messages'] += 1
+        bucket['tool_calls'] += len(tools)
+        bucket['types'][message_type] = bucket['types'].get(message_type, 0) + 1
+        if agent_id:
+            bucket['agents'][agent_id] = bucket['agents'].get(agent_id, 0) + 1
+
+    @staticmethod
+    def record_message(conn, session_id, message_type, agent_id, tool_calls, timestamp):
+        """Fold a newly inserted message into its session summary (in the caller's transaction)"""
+        SessionSummaryDAO._lock(conn, session_id)
+        summary = SessionSummaryDAO._load(conn, session_id)
+        SessionSummaryDAO._fold(summary, message_type, agent_id, tool_calls, timestamp)
+        SessionSummaryDAO._store(conn, session_id, summary)
+
+    @staticmethod
+    def merge(conn, session_id, summary):
+        """Add a summary of newly inserted messages into the stored one (in the caller's transaction)"""
+        SessionSummaryDAO._lock(conn, session_id)
+        stored = SessionSummaryDAO._load(conn, session_id)
+        stored['message_count'] += summary['message_count']
+        for field in ('agent_counts', 'tool_counts'):
+            for key, count in summary[field].items():
+                stored[field][key] = stored[field].get(key, 0) + count
+
+        timeline = stored['timeline']
+        for bucket in summary['timeline']:
+            if timeline and timeline[-1]['bucket'] == bucket['bucket']:
+                last = timeline[-1]
+                last['messages'] += bucket['messages']
+                last['tool_calls'] += bucket['tool_calls']
+                for field in ('types', 'agents'):
+                    for key, count in bucket[field].items():
+                        last[field][key] = last[field].get(key, 0) + count
+            else:
+                timeline.append(bucket)
+        del timeline[:-TIMELINE_BUCKETS]
+        SessionSummaryDAO._store(conn, session_id, stored)
+
+    @staticmethod
+    def rebuild(conn, session_id=None):
+        """Recompute summaries from chat_history for one session or all sessions"""
+        if session_id is None:
+            conn.execute('DELETE FROM session_summary')
+            cursor = conn.execute('''
+                SELECT session_id, message_type, agent_id, tool_calls, timestamp
+                FROM chat_history
+                ORDER BY session_id, id
+            ''')
+        else:
+            conn.execute('DELETE FROM session_summary WHERE session_id = ?', (session_id,))
+            cursor = conn.execute('''
+                SELECT session_id, message_type, agent_id, tool_calls, timestamp
+                FROM chat_history
+                WHERE session_id = ?
+                ORDER BY id
+            ''', (session_id,))
+
+        # Rows arrive grouped by session, so only one summary is held in memory
+        current_id, summary = None, None
+        for row_session_id, message_type, agent_id, tool_calls, timestamp in cursor:
+            if row_session_id != current_id:
+                if current_id is not None:
+                    SessionSummaryDAO._store(conn, current_id, summary)
+                current_id, summary = row_session_id, SessionSummaryDAO._empty()
+            SessionSummaryDAO._fold(summary, message_type, agent_id, decode_payload(tool_calls, []), timestamp)
+        if current_id is not None:
+            SessionSummaryDAO._store(conn, current_id, summary)
+
+    @staticmethod
+    def delete(conn, session_id):
+        """Remove the summary of a deleted session"""
+        conn.execute('DELETE FROM session_summary WHERE session_id = ?', (session_id,))
@@ -0,0 +1,177 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager
+from fastmcp import Client
+
+
+class _PooledConnection:
+    """A single long-lived FastMCP client connection owned by the pool loop"""
+
+    def __init__(self, endpoint_url):
+        self.endpoint_url = endpoint_url
+        self.client = None
+        self.last_used = 0.0
+        self._closing = None
+        self._runner = None
+
+    @property
+    def connected(self):
+        return self.client is not None and self._runner is not None and not self._runner.done()
+
+    async def open(self):
+        """Connect and keep the client context open in a dedicated task"""
+        ready = asyncio.get_running_loop().create_future()
+        self._closing = asyncio.Event()
+        self._runner = asyncio.create_task(self._hold(ready))
+        try:
+            await ready
+        except BaseException:
+            # Also on cancellation (e.g. by wait_for), which would otherwise
+            # leave the runner task and its connection behind
+            await self.close()
+            raise
+        self.last_used = time.monotonic()
+
+    async def _hold(self, ready):
+        # The client context is entered and exited by the same task so the
+        # transport's cancel scopes stay valid for the connection lifetime
+        try:
+            async with Client(self.endpoint_url) as client:
+                self.client = client
+                ready.set_result(client)
+                await self._closing.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+        finally:
+            self.client = None
+
+    async def close(self, timeout=5.0):
+        """Close the connection, cancelling it if it does not shut down in time"""
+        if self._closing is not None:
+            self._closing.set()
+        if self._runner is not None and not self._runner.done():
+            try:
+                await asyncio.wait_for(asyncio.shield(self._runner), timeout)
+            except Exception:
+                self._runner.cancel()
+        self.client = None
+        self._runner = None
+
+
+class MCPClientPool:
+    """Pool of persistent FastMCP client sessions running on a background event loop"""
+
+    def __init__(self, endpoint_url, pool_size=4, health_check_interval=30.0,
+                 connect_timeout=10.0, max_retries=5, initial_backoff=0.5, max_backoff=30.0):
+        self.endpoint_url = endpoint_url
+        self.pool_size = max(1, int(pool_size))
+        self.health_check_interval = health_check_interval
+        self.connect_timeout = connect_timeout
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self._loop = None
+        self._thread = None
+        self._idle = None
+        self._connections = []
+        self._start_lock = threading.Lock()
+
+    @property
+    def loop(self):
+        """The pool's event loop, started on first access"""
+        self.start()
+        return self._loop
+
+    def start(self):
+        """Start the background event loop thread if it is not running yet"""
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            self._thread = threading.Thread(
+                target=self._run_loop, args=(ready,), name='mcp-client-pool', daemon=True
+            )
+            self._thread.start()
+            ready.wait()
+
+    def _run_loop(self, ready):
+        asyncio.set_event_loop(self._loop)
+        self._idle = asyncio.LifoQueue()
+        self._connections = [_PooledConnection(self.endpoint_url) for _ in range(self.pool_size)]
+        for conn in self._connections:
+            self._idle.put_nowait(conn)
+        ready.set()
+        self._loop.run_forever()
+
+    def submit(self, coro):
+        """Schedule a coroutine on the pool loop and return a concurrent future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the pool loop and block until it completes"""
+        return self.submit(coro).result(timeout)
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Borrow a connected client from the pool (must be used on the pool loop)"""
+        conn = await self._idle.get()
+        try:
+            await self._ensure_connected(conn)
+            try:
+                yield conn.client
+            except BaseException:
+                # Force a health check before this connection is handed out again
+                conn.last_used = 0.0
+                raise
+            else:
+                conn.last_used = time.monotonic()
+        finally:
+            self._idle.put_nowait(conn)
+
+    async def _ensure_connected(self, conn):
+        if conn.connected:
+            if time.monotonic() - conn.last_used < self.health_check_interval:
+                return
+            try:
+                await asyncio.wait_for(conn.client.ping(), self.connect_timeout)
+                conn.last_used = time.monotonic()
+                return
+            except Exception as e:
+                print(f"⚠️ MCP health check failed, reconnecting: {e}")
+                await conn.close()
+        await self._connect_with_backoff(conn)
+
+    async def _connect_with_backoff(self, conn):
+        delay = self.initial_backoff
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                await asyncio.wait_for(conn.open(), self.connect_timeout)
+                return
+            except Exception as e:
+                await conn.close()
+                if attempt == self.max_retries:
+                    raise
+                print(f"⚠️ MCP connection attempt {attempt} failed: {e}; retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_backoff)
+
+    def close(self):
+        """Close all pooled connections and stop the background loop"""
+        with self._start_lock:
+            if self._loop is None:
+                return
+            loop, self._loop = self._loop, None
+
+        async def _close_all():
+            for conn in self._connections:
+                await conn.close()
+
+        try:
+            asyncio.run_coroutine_threadsafe(_close_all(), loop).result(10)
+        except Exception as e:
+            print(f"⚠️ Error closing MCP connections: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join(timeout=5)
@@ -1,26 +1,100 @@
 import requests
 import asyncio
-from fastmcp import Client
+import json
+import os
 import sys
+import threading
+from .caching import TTLCache
+from .mcp_client_pool import MCPClientPool
+from .metrics import metrics
 
 
 class MCPToolsManager:
     """Manage MCP server tools integration"""
 
-    def __init__(self, endpoint_url):
+    def __init__(self, endpoint_url, pool_size=4, health_check_interval=30.0,
+                 tool_cache_size=4096, cache_policies=None,
+                 snapshot_path='mcp_tools_snapshot.json', refresh_interval=300.0):
         self.endpoint_url = endpoint_url
         self.available_tools = []
+        self._tool_index = {}  # tool name -> tool, for O(1) lookups
+        self.snapshot_path = snapshot_path
+        self.refresh_interval = refresh_interval
+        self.pool = MCPClientPool(endpoint_url, pool_size=pool_size,
+                                  health_check_interval=health_check_interval)
+        # Results of read-only tools, keyed on (tool_name, canonical parameters)
+        self.tool_cache = TTLCache(maxsize=tool_cache_size)
+        self.cache_policies = dict(cache_policies or {})  # tool_name -> TTL seconds
+        self._inflight = {}  # cache key -> (task, generation), only touched on the pool loop
+        # Invalidation counts per scope: None (all tools), a tool name or a cache key
+        self._generations = {}
+        self._generations_lock = threading.Lock()
         self._initialize_tools()
 
     def _initialize_tools(self):
-        """Initialize available tools from MCP server"""
-        self.available_tools = self.get_tools() or []
+        """Load the last tool catalog snapshot and refresh it in the background"""
+        # Startup never waits on the MCP server; the snapshot (if any) is
+        # served until the first background refresh completes
+        self._load_snapshot()
+        self._refresh_future = self.pool.submit(self._refresh_loop())
+
+    def _set_catalog(self, tools):
+        """Swap in a new tool catalog and its name index"""
+        self._tool_index = {tool['name']: tool for tool in tools}
+        self.available_tools = tools
+
+    def _load_snapshot(self):
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path) as f:
+                self._set_catalog(json.load(f))
+            print(f"📋 Loaded {len(self.available_tools)} tools from snapshot")
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not load MCP tool snapshot: {e}")
+
+    def _save_snapshot(self, tools):
+        if not self.snapshot_path:
+            return
+        tmp_path = f"{self.snapshot_path}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(tools, f, default=str)
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError as e:
+            print(f"⚠️ Could not save MCP tool snapshot: {e}")
+
+    async def _refresh_catalog_async(self):
+        tools = await self._get_tools_async()
+        self._set_catalog(tools)
+        self._save_snapshot(tools)
+        return tools
+
+    async def _refresh_loop(self):
+        """Refresh the catalog now and then every refresh_interval seconds"""
+        while True:
+            try:
+                await self._refresh_catalog_async()
+            except Exception as e:
+                # Keep serving the last known catalog
+                print(f"⚠️ MCP tool catalog refresh failed: {e}")
+            if not self.refresh_interval:
+                return
+            await asyncio.sleep(self.refresh_interval)
+
+    def has_tool(self, tool_name):
+        """Check whether the MCP server provides a tool"""
+        return tool_name in self._tool_index
+
+    def get_tool(self, tool_name):
+        """Get a tool's catalog entry by name"""
+        return self._tool_index.get(tool_name)
 
     def get_tools(self):
         """Get tools from FastMCP server using async pattern"""
         try:
-            # Use asyncio.run to execute the async function
-            return asyncio.run(self._get_tools_async())
+            # Run on the pool's background loop so the session is reused
+            return self.pool.run(self._get_tools_async())
         except Exception as e:
             print(f"❌ Error: {e}")
             import traceback
@@ -29,16 +103,9 @@ class MCPToolsManager:
 
     async def _get_tools_async(self):
         """Async method to get tools from FastMCP server"""
-        print("🔍 Testing FastMCP Client connection...")
-
-        # Use the same pattern as your working fastmcp_test.py
-        async with Client(self.endpoint_url) as client:
-            print("✅ Successfully connected to FastMCP server")
-
-            # Test basic functionality
-            print("📋 Attempting to list tools...")
+        async with self.pool.acquire() as client:
             tools = await client.list_tools()
-            print(f"✅ Found {len(tools)} tools")
+            print(f"✅ Found {len(tools)} tools on FastMCP server")
 
             # Process tools into our format
             formatted_tools = []
@@ -50,14 +117,13 @@ class MCPToolsManager:
                     'parameters': getattr(tool, 'parameters', []) or []
                 }
                 formatted_tools.append(formatted_tool)
-                print(f"  {i+1}. {tool.name} - {tool.description}")
 
             return formatted_tools
 
     def call_tool(self, tool_name, parameters):
         """Call a specific MCP tool using async pattern"""
         try:
-            return asyncio.run(self._call_tool_async(tool_name, parameters))
+            return self.pool.run(self._call_tool_async(tool_name, parameters))
         except Exception as e:
             print(f"❌ Tool call error: {e}")
             # Return error response instead of mock
@@ -68,15 +134,169 @@ class MCPToolsManager:
             }
 
     async def _call_tool_async(self, tool_name, parameters):
-        """Async method to call MCP tools"""
-        async with Client(self.endpoint_url) as client:
-            result = await client.call_tool(tool_name, parameters)
+        """Async method to call MCP tools, serving cacheable tools from the result cache"""
+        ttl = self.cache_policies.get(tool_name)
+        if not ttl:
+            return await self._invoke_tool_async(tool_name, parameters)
+
+        key = self._cache_key(tool_name, parameters)
+        cached = self.tool_cache.get(key)
+        if cached is not None:
+            return cached
+
+        # Coalesce concurrent identical calls onto one in-flight request, unless
+        # the cache was invalidated after that request started
+        generation = self._generation(key)
+        inflight = self._inflight.get(key)
+        if inflight is None or inflight[1] != generation:
+            task = asyncio.ensure_future(self._invoke_and_cache(key, ttl, tool_name, parameters, generation))
+            self._inflight[key] = (task, generation)
+            task.add_done_callback(lambda done: self._forget_inflight(key, done))
+        else:
+            task = inflight[0]
+
+        # Shield so one caller timing out does not cancel the request for the others
+        return await asyncio.shield(task)
+
+    async def _invoke_and_cache(self, key, ttl, tool_name, parameters, generation):
+        result = await self._invoke_tool_async(tool_name, parameters)
+        # A result fetched across an invalidation may predate it, so it is not cached
+        if result.get('success') and self._generation(key) == generation:
+            self.tool_cache.set(key, result, ttl=ttl)
+        return result
+
+    def _forget_inflight(self, key, task):
+        inflight = self._inflight.get(key)
+        if inflight is not None and inflight[0] is task:
+            del self._inflight[key]
+
+    def _generation(self, key):
+        """Invalidation counts covering a cache key: all tools, its tool, the key itself"""
+        generations = self._generations
+        return generations.get(None, 0), generations.get(key[0], 0), generations.get(key, 0)
+
+    def _bump_generation(self, scope):
+        with self._generations_lock:
+            self._generations[scope] = self._generations.get(scope, 0) + 1
+
+    @staticmethod
+    def _cache_key(tool_name, parameters):
+        return tool_name, json.dumps(parameters or {}, sort_keys=True, separators=(',', ':'), default=str)
+
+    async def _invoke_tool_async(self, tool_name, parameters):
+        """Call a tool on the MCP server"""
+        # Includes the wait for a pooled connection. Names outside the catalog
+        # (e.g. from the tool test endpoint URL) share one label, so callers
+        # cannot create an unbounded number of histograms
+        label = tool_name if self.has_tool(tool_name) else 'unknown'
+        with metrics.timer('tool_call', tool=label):
+            async with self.pool.acquire() as client:
+                result = await client.call_tool(tool_name, parameters)
             return {
                 "success": True,
-                "result": result.content if hasattr(result, 'content') else str(result),
+                "result": self._serialize_content(result.content) if hasattr(result, 'content') else str(result),
                 "tool": tool_name
             }
 
+    @staticmethod
+    def _serialize_content(content):
+        """Convert MCP content blocks to plain data so results can be stored as JSON"""
+        return [
+            block.model_dump(exclude_none=True) if hasattr(block, 'model_dump') else block
+            for block in content
+        ]
+
+    @metrics.timed('tools')
+    def call_tools(self, calls, timeout=None, max_concurrency=None):
+        """Call several MCP tools concurrently, returning results in call order"""
+        if not calls:
+            return []
+        try:
+            return self.pool.run(self._call_tools_async(calls, timeout, max_concurrency))
+        except Exception as e:
+            print(f"❌ Tool fan-out error: {e}")
+            return [
+                {"success": False, "error": str(e), "tool": tool_name}
+                for tool_name, _ in calls
+            ]
+
+    async def call_tool_async(self, tool_name, parameters):
+        """Async call_tool; must be awaited on the pool loop (see run_async)"""
+        try:
+            return await self._call_tool_async(tool_name, parameters)
+        except Exception as e:
+            print(f"❌ Tool call error: {e}")
+            return {"success": False, "error": str(e), "tool": tool_name}
+
+    async def call_tools_async(self, calls, timeout=None, max_concurrency=None):
+        """Async call_tools; must be awaited on the pool loop (see run_async)"""
+        if not calls:
+            return []
+        with metrics.timer('tools'):
+            return await self._call_tools_async(calls, timeout, max_concurrency)
+
+    async def run_async(self, coro):
+        """Await a coroutine on the shared pool loop from any other event loop"""
+        return await asyncio.wrap_future(self.pool.submit(coro))
+
+    async def iterate_async(self, agen):
+        """Iterate an async generator on the shared pool loop from any other event loop"""
+        try:
+            while True:
+                try:
+                    yield await self.run_async(agen.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            await self.run_async(agen.aclose())
+
+    async def _call_tools_async(self, calls, timeout, max_concurrency):
+        """Async fan-out of (tool_name, parameters) calls with bounded concurrency"""
+        semaphore = asyncio.Semaphore(max_concurrency or self.pool.pool_size)
+
+        async def _call_one(tool_name, parameters):
+            async with semaphore:
+                try:
+                    return await asyncio.wait_for(self._call_tool_async(tool_name, parameters), timeout)
+                except asyncio.TimeoutError:
+                    return {
+                        "success": False,
+                        "error": f"Tool call timed out after {timeout}s",
+                        "tool": tool_name
+                    }
+                except Exception as e:
+                    print(f"❌ Tool call error: {e}")
+                    return {"success": False, "error": str(e), "tool": tool_name}
+
+        # gather preserves the order of the calls regardless of completion order
+        return await asyncio.gather(*(_call_one(name, params) for name, params in calls))
+
+    def set_cache_policy(self, tool_name, ttl):
+        """Cache results of a read-only tool for ttl seconds (0 or None disables caching)"""
+        if ttl:
+            self.cache_policies[tool_name] = ttl
+        else:
+            self.cache_policies.pop(tool_name, None)
+            self.invalidate_tool_cache(tool_name)
+
+    def invalidate_tool_cache(self, tool_name=None, parameters=None):
+        """Drop cached results for one call, one tool, or every tool; returns entries removed"""
+        if tool_name is None:
+            self._bump_generation(None)
+            removed = len(self.tool_cache)
+            self.tool_cache.clear()
+            return removed
+        if parameters is not None:
+            key = self._cache_key(tool_name, parameters)
+            self._bump_generation(key)
+            return 0 if self.tool_cache.pop(key) is None else 1
+
+        self._bump_generation(tool_name)
+        keys = [key for key in self.tool_cache.keys() if key[0] == tool_name]
+        for key in keys:
+            self.tool_cache.pop(key)
+        return len(keys)
+
     def get_tools_list(self):
         """Get formatted list of tools for API response"""
         return self.available_tools
@@ -87,9 +307,17 @@ class MCPToolsManager:
 
     def refresh_tools(self):
         """Refresh tools list from MCP server"""
-        self._initialize_tools()
+        try:
+            self.pool.run(self._refresh_catalog_async())
+        except Exception as e:
+            print(f"❌ Error refreshing tools: {e}")
         return self.get_tools_list()
 
+    def close(self):
+        """Stop the catalog refresh and close pooled MCP connections"""
+        self._refresh_future.cancel()
+        self.pool.close()
+
 
 if __name__ == "__main__":
     mcp_manager = MCPToolsManager("http://127.0.0.1:8000/sse")
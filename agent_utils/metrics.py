@@ -0,0 +1,157 @@
+import bisect
+import contextvars
+import functools
+import threading
+import time
+
+# Latency buckets in seconds, from sub-millisecond DB work to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Phase durations of the request being handled in the current thread or task
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus style"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _NullTimer:
+    """Timer used while metrics are disabled; does nothing"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ('metrics', 'phase', 'labels', 'started')
+
+    def __init__(self, metrics, phase, labels):
+        self.metrics = metrics
+        self.phase = phase
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.phase, time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class Metrics:
+    """Per-phase latency histograms with optional per-request timing breakdowns
+
+    Phases are timed with the timer() context manager or the timed()
+    decorator. While disabled both cost a single attribute check.
+    """
+
+    def __init__(self, enabled=False, buckets=DEFAULT_BUCKETS, name='chat_phase_seconds'):
+        self.enabled = enabled
+        self.buckets = buckets
+        self.name = name
+        self._histograms = {}  # (phase, sorted label items) -> Histogram
+        self._lock = threading.Lock()
+
+    def timer(self, phase, **labels):
+        """Time a block as one observation of phase"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, phase, labels)
+
+    def timed(self, phase, **labels):
+        """Decorator timing every call of a function as phase"""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with _Timer(self, phase, labels):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def observe(self, phase, seconds, **labels):
+        """Record a duration for phase, also adding it to the current request's timings"""
+        key = (phase, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[phase] = timings.get(phase, 0.0) + seconds
+
+    def begin_request(self):
+        """Start collecting phase timings for the request in the current context"""
+        # Always reset, so a worker thread never reports a previous request's timings
+        _request_timings.set({'total': time.perf_counter()} if self.enabled else None)
+
+    def server_timing(self):
+        """Format the current request's phase timings as a Server-Timing header value"""
+        timings = _request_timings.get()
+        if not timings:
+            return None
+        entries = [f"{phase};dur={seconds * 1000:.2f}" for phase, seconds in timings.items() if phase != 'total']
+        entries.append(f"total;dur={(time.perf_counter() - timings['total']) * 1000:.2f}")
+        return ', '.join(entries)
+
+    def snapshot(self):
+        """Get count, sum and bucket counts per (phase, labels) series"""
+        with self._lock:
+            return {
+                key: {'count': h.count, 'sum': h.sum, 'counts': list(h.counts)}
+                for key, h in self._histograms.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def render_prometheus(self):
+        """Render all histograms in the Prometheus text exposition format"""
+        lines = [
+            f"# HELP {self.name} Time spent in each phase of handling a chat turn",
+            f"# TYPE {self.name} histogram",
+        ]
+        for (phase, labels), data in sorted(self.snapshot().items()):
+            label_text = ','.join(f'{name}="{_escape(value)}"' for name, value in (('phase', phase),) + labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), data['counts']):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{{{label_text},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {data['sum']}")
+            lines.append(f"{self.name}_count{{{label_text}}} {data['count']}")
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Shared registry used across agent_utils; main.py enables it from config
+metrics = Metrics()
@@ -1,146 +1,60 @@
-import sqlite3
-import json
-import uuid
+from .database import DatabaseManager
+from .database.session_summary_dao import SessionSummaryDAO
+from .database.chat_history_dao import ChatHistoryDAO
+from .database.session_dao import SessionDAO
+from .metrics import metrics
 
 
 class SessionManager:
     """Manage chat sessions with SQLite persistence"""
 
-    @staticmethod
-    def create_session(customer_id):
-        """Create a new chat session"""
-        session_id = str(uuid.uuid4())
-        conn = sqlite3.connect('chat_sessions.db')
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            INSERT INTO sessions (id, customer_id, metadata)
-            VALUES (?, ?, ?)
-        ''', (session_id, customer_id, json.dumps({})))
+    def __init__(self, db_manager=None):
+        self.db = db_manager or DatabaseManager.shared()
+        self.sessions = SessionDAO(db_manager=self.db)
+        self.history = ChatHistoryDAO(db_manager=self.db)
+        self.summaries = SessionSummaryDAO(db_manager=self.db)
 
-        conn.commit()
-        conn.close()
-
-        return session_id
+    def create_session(self, customer_id):
+        """Create a new chat session"""
+        return self.sessions.create_session(customer_id)
 
-    @staticmethod
-    def get_session(session_id):
+    def get_session(self, session_id):
         """Get session details"""
-        conn = sqlite3.connect('chat_sessions.db')
-        cursor = conn.cursor()
+        return self.sessions.get_session(session_id)
 
-        cursor.execute('SELECT * FROM sessions WHERE id = ?', (session_id,))
-        session = cursor.fetchone()
-
-        conn.close()
-        return session
-
-    @staticmethod
-    def add_message(session_id, message_type, content, agent_id=None, metadata=None, tool_calls=None):
+    @metrics.timed('session_write')
+    def add_message(self, session_id, message_type, content, agent_id=None, metadata=None, tool_calls=None):
         """Add message to chat history"""
-        conn = sqlite3.connect('chat_sessions.db')
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            INSERT INTO chat_history (session_id, message_type, content, agent_id, metadata, tool_calls)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (session_id, message_type, content, agent_id,
-              json.dumps(metadata or {}), json.dumps(tool_calls or [])))
-
-        conn.commit()
-        conn.close()
+        # The DAO keeps the session's analytics in step within the same transaction
+        self.history.add_message(session_id, message_type, content, agent_id, metadata, tool_calls)
 
-    @staticmethod
-    def get_chat_history(session_id):
+    def get_chat_history(self, session_id):
         """Get chat history for a session"""
-        conn = sqlite3.connect('chat_sessions.db')
-        cursor = conn.cursor()
+        return self.history.get_chat_history(session_id, limit=None)
 
-        cursor.execute('''
-            SELECT message_type, content, agent_id, timestamp, metadata, tool_calls
-            FROM chat_history
-            WHERE session_id = ?
-            ORDER BY timestamp ASC
-        ''', (session_id,))
+    def get_chat_history_page(self, session_id, limit=50, before_id=None, after_id=None):
+        """Get one page of chat history as (messages, has_more); see ChatHistoryDAO.get_chat_history_page"""
+        return self.history.get_chat_history_page(session_id, limit, before_id, after_id)
 
-        history = cursor.fetchall()
-        conn.close()
+    def get_history_state(self, session_id):
+        """Get (message_count, last_message_id) for a session, for cache validation"""
+        return self.history.get_history_state(session_id)
 
-        return [
-            {
-                'type': row[0],
-                'content': row[1],
-                'agent_id': row[2],
-                'timestamp': row[3],
-                'metadata': json.loads(row[4]) if row[4] else {},
-                'tool_calls': json.loads(row[5]) if row[5] else []
-            }
-            for row in history
-        ]
+    def get_session_summary(self, session_id):
+        """Get precomputed message, agent, tool and timeline counts for a session"""
+        return self.summaries.get_summary(session_id)
 
-    @staticmethod
-    def get_latest_messages(session_id, count=10):
-        """Get the latest N messages from a session"""
-        conn = sqlite3.connect('chat_sessions.db')
-        cursor = conn.cursor()
+    def get_latest_messages(self, session_id, count=10):
+        """Get the latest N messages from a session, newest first"""
+        return self.history.get_recent_messages(session_id, count)
 
-        cursor.execute('''
-            SELECT message_type, content, agent_id, timestamp, metadata, tool_calls
-            FROM chat_history
-            WHERE session_id = ?
-            ORDER BY timestamp DESC
-            LIMIT ?
-        ''', (session_id, count))
-
-        messages = cursor.fetchall()
-        conn.close()
-
-        return [
-            {
-                'type': row[0],
-                'content': row[1],
-                'agent_id': row[2],
-                'timestamp': row[3],
-                'metadata': json.loads(row[4]) if row[4] else {},
-                'tool_calls': json.loads(row[5]) if row[5] else []
-            }
-            for row in messages
-        ]
-
-    @staticmethod
-    def get_sessions_by_customer(customer_id, limit=10):
+    def get_sessions_by_customer(self, customer_id, limit=10):
         """Get all sessions for a customer"""
-        conn = sqlite3.connect('chat_sessions.db')
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT id, customer_id, metadata
-            FROM sessions
-            WHERE customer_id = ?
-            ORDER BY created_at DESC
-            LIMIT ?
-        ''', (customer_id, limit))
+        return self.sessions.get_sessions_by_customer(customer_id, limit)
 
-        sessions = cursor.fetchall()
-        conn.close()
-
-        return [
-            {
-                'id': row[0],
-                'customer_id': row[1],
-                'metadata': json.loads(row[2]) if row[2] else {}
-            }
-            for row in sessions
-        ]
-
-    @staticmethod
-    def delete_session(session_id):
+    def delete_session(self, session_id):
         """Delete a session and all related data"""
-        conn = sqlite3.connect('chat_sessions.db')
-        cursor = conn.cursor()
-
-        cursor.execute('DELETE FROM chat_history WHERE session_id = ?', (session_id,))
-        cursor.execute('DELETE FROM sessions WHERE id = ?', (session_id,))
-
-        conn.commit()
-        conn.close()
+        with self.db.connection() as conn:
+            conn.execute('DELETE FROM chat_history WHERE session_id = ?', (session_id,))
+            conn.execute('DELETE FROM sessions WHERE id = ?', (session_id,))
+            SessionSummaryDAO.delete(conn, session_id)
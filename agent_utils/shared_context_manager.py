@@ -0,0 +1,349 @@
+import asyncio
+import atexit
+import json
+import threading
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from .caching import TTLCache
+from .context_manager import _ContextEntry
+from .metrics import metrics
+
+try:
+    import redis
+    from redis.exceptions import WatchError
+except ImportError:  # redis is only needed when a shared context store is configured
+    redis = None
+
+    class WatchError(Exception):
+        """Stand-in so an injected client's errors are not masked without redis installed"""
+
+# Hash field counting writes to a session; context keys never start with '__'
+VERSION_FIELD = '__version__'
+
+
+def _text(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+class _PendingWrite:
+    """Field changes to one session, merged until they are committed"""
+
+    __slots__ = ('updates', 'increments', 'removed')
+
+    def __init__(self):
+        self.updates = {}
+        self.increments = {}
+        self.removed = set()
+
+    def merge(self, updates=None, increments=None, removed=()):
+        for key, value in (updates or {}).items():
+            self.updates[key] = value
+            self.increments.pop(key, None)
+            self.removed.discard(key)
+        for key, amount in (increments or {}).items():
+            if key in self.updates:
+                self.updates[key] = self.updates[key] + amount
+            else:
+                self.increments[key] = self.increments.get(key, 0) + amount
+            self.removed.discard(key)
+        for key in removed:
+            self.updates.pop(key, None)
+            self.increments.pop(key, None)
+            self.removed.add(key)
+
+
+class SharedContextManager:
+    """Conversation context in a Redis-compatible store shared by all workers
+
+    Each session is one hash with a JSON-encoded field per context key, so
+    a write sends only the keys it changes and workers updating different
+    keys never overwrite each other. Every write bumps a version field and
+    publishes an invalidation in the same MULTI/EXEC; each process keeps a
+    near-cache of the hashes it has read and drops an entry when another
+    process writes it. Read-modify-write callers pass the values they read
+    as expected, which are checked under WATCH and retried on contention.
+
+    Offers the ContextManager interface. Pass client to use an existing
+    connection (e.g. fakeredis in tests) instead of a URL.
+    """
+
+    def __init__(self, url=None, client=None, key_prefix='context:', channel='context:invalidate',
+                 ttl=7 * 24 * 3600, cache_size=10000, cache_ttl=3600, max_retries=10):
+        if client is None:
+            if redis is None:
+                raise ImportError("The shared context store requires redis (pip install redis)")
+            client = redis.Redis.from_url(url, decode_responses=True)
+        self.client = client
+        self.key_prefix = key_prefix
+        self.channel = channel
+        # Sessions nobody has touched for this many seconds expire from the store
+        self.ttl = ttl
+        self.max_retries = max_retries
+        # Near-cache of session_id -> _ContextEntry, valid only while subscribed
+        self.memory_store = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self.node_id = uuid.uuid4().hex
+        self.invalidations = 0
+        self._subscribed = False
+        # Bumped by every invalidation, so a load that raced with one is not cached
+        self._generation = 0
+        self._lock = threading.RLock()
+        # session_id -> _PendingWrite of the open batch (see ContextManager)
+        self._pending = ContextVar(f'shared_context_batch_{id(self)}', default=None)
+        self._stop = threading.Event()
+        self._listener = threading.Thread(target=self._listen, name='context-invalidation', daemon=True)
+        self._listener.start()
+        atexit.register(self.close)
+
+    def _key(self, session_id):
+        return f"{self.key_prefix}{session_id}"
+
+    def update_context(self, session_id, key, value):
+        """Update context for a session"""
+        self.update_many(session_id, {key: value})
+
+    @metrics.timed('context_save')
+    def update_many(self, session_id, updates, expected=None, increments=None):
+        """Update several context fields for a session with a single write
+
+        expected maps fields to the values the caller read (None for a
+        missing field); if any has changed in the store nothing is written
+        and False is returned. increments are added to integer fields
+        atomically in the store.
+        """
+        return self._write(session_id, updates, increments, expected=expected)
+
+    def _write(self, session_id, updates=None, increments=None, removed=(), expected=None):
+        """Commit field changes now, or merge them into the open batch"""
+        pending = self._pending.get()
+        if pending is not None and not expected:
+            pending.setdefault(session_id, _PendingWrite()).merge(updates, increments, removed)
+            return True
+
+        write = _PendingWrite()
+        write.merge(updates, increments, removed)
+        return self._commit({session_id: write}, session_id if expected else None, expected)
+
+    @contextmanager
+    def batch(self):
+        """Defer context writes made in this block and send them in one transaction
+
+        Deferred writes reach the store, and this process's reads, when the
+        block exits; writes with expected values are still made immediately.
+        """
+        pending = self._open_batch()
+        try:
+            yield
+        finally:
+            if pending is not None:
+                self._pending.set(None)
+                if pending:
+                    self._commit(pending)
+
+    @asynccontextmanager
+    async def batch_async(self):
+        """batch() for coroutines; the write runs in a thread, off the event loop"""
+        pending = self._open_batch()
+        try:
+            yield
+        finally:
+            if pending is not None:
+                self._pending.set(None)
+                if pending:
+                    await asyncio.to_thread(self._commit, pending)
+
+    def _open_batch(self):
+        """Start collecting deferred writes, or return None inside an open batch"""
+        if self._pending.get() is not None:
+            return None
+        pending = {}
+        self._pending.set(pending)
+        return pending
+
+    def _commit(self, writes, watched=None, expected=None):
+        """Apply field changes to several sessions in one MULTI/EXEC
+
+        With expected values the watched session's fields are compared first
+        under WATCH, and the transaction is retried if the hash changes
+        before it executes.
+        """
+        for _ in range(self.max_retries):
+            with self.client.pipeline() as pipe:
+                try:
+                    if expected:
+                        key = self._key(watched)
+                        pipe.watch(key)
+                        fields = list(expected)
+                        stored = pipe.hmget(key, fields)
+                        if any(self._decode(raw) != expected[field] for field, raw in zip(fields, stored)):
+                            return False
+                        pipe.multi()
+
+                    layout = []
+                    offset = 0
+                    for session_id, write in writes.items():
+                        start, version_index, offset = self._queue_write(pipe, session_id, write, offset)
+                        layout.append((session_id, write, start, version_index))
+                    results = pipe.execute()
+                except WatchError:
+                    continue
+
+            for session_id, write, start, version_index in layout:
+                increments = dict(zip(write.increments, results[start:start + len(write.increments)]))
+                self._apply_local(session_id, write, increments, results[version_index])
+            return True
+
+        raise RuntimeError(f"Context for session {watched} kept changing; gave up after {self.max_retries} attempts")
+
+    def _queue_write(self, pipe, session_id, write, offset):
+        """Queue one session's changes after offset earlier commands
+
+        Returns where its increment and version results will be in the
+        transaction's replies, and the offset for the next session.
+        """
+        key = self._key(session_id)
+        if write.updates:
+            pipe.hset(key, mapping={field: json.dumps(value) for field, value in write.updates.items()})
+            offset += 1
+        start = offset
+        for field, amount in write.increments.items():
+            pipe.hincrby(key, field, amount)
+        offset += len(write.increments)
+        if write.removed:
+            pipe.hdel(key, *write.removed)
+            offset += 1
+        pipe.hincrby(key, VERSION_FIELD, 1)
+        version_index = offset
+        offset += 1
+        if self.ttl:
+            pipe.expire(key, int(self.ttl))
+            offset += 1
+        pipe.publish(self.channel, f"{self.node_id} {session_id}")
+        return start, version_index, offset + 1
+
+    def _apply_local(self, session_id, write, increments, version):
+        """Bring the near-cache up to date with a write this process made"""
+        with self._lock:
+            entry = self.memory_store.peek(session_id)
+            if entry is None:
+                return
+            if entry.version != version - 1:
+                # Another process wrote in between; reload on next read
+                self.memory_store.pop(session_id)
+                return
+            entry.data.update(write.updates)
+            entry.data.update(increments)
+            for field in write.removed:
+                entry.data.pop(field, None)
+            entry.version = version
+
+    @metrics.timed('context_load')
+    def get_context(self, session_id):
+        """Get context for a session"""
+        return self._get_entry(session_id).data
+
+    def _get_entry(self, session_id):
+        entry = self.memory_store.get(session_id)
+        if entry is None:
+            return self._load(session_id)
+        return entry
+
+    def _load(self, session_id):
+        """Read a session's hash from the store, caching it if no write raced the read"""
+        with self._lock:
+            generation = self._generation
+
+        raw = self.client.hgetall(self._key(session_id))
+        data = {}
+        version = 0
+        for field, value in raw.items():
+            field = _text(field)
+            if field == VERSION_FIELD:
+                version = int(value)
+            else:
+                data[field] = json.loads(value)
+        entry = _ContextEntry(data, version)
+
+        with self._lock:
+            if self._subscribed and self._generation == generation:
+                self.memory_store.set(session_id, entry)
+        return entry
+
+    @staticmethod
+    def _decode(raw):
+        return None if raw is None else json.loads(raw)
+
+    def _listen(self):
+        """Drop near-cache entries that other processes have written"""
+        while not self._stop.is_set():
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self.channel)
+                # Writes made while unsubscribed were missed, so start empty
+                with self._lock:
+                    self._invalidate_all()
+                    self._subscribed = True
+                while not self._stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message['type'] == 'message':
+                        self._on_invalidate(_text(message['data']))
+            except Exception as e:
+                print(f"⚠️ Context invalidation listener failed: {e}")
+                self._stop.wait(1.0)
+            finally:
+                with self._lock:
+                    self._subscribed = False
+                    self._invalidate_all()
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+    def _on_invalidate(self, data):
+        origin, _, session_id = data.partition(' ')
+        if origin == self.node_id:
+            return
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            self.memory_store.pop(session_id)
+
+    def _invalidate_all(self):
+        self._generation += 1
+        self.memory_store.clear()
+
+    def flush(self):
+        """Context is written through to the store, so there is nothing to flush"""
+        return 0
+
+    def close(self):
+        """Stop listening for invalidations"""
+        self._stop.set()
+        if self._listener is not None:
+            self._listener.join(timeout=5)
+            self._listener = None
+
+    def clear_context(self, session_id):
+        """Clear context for a session"""
+        with self.client.pipeline() as pipe:
+            pipe.delete(self._key(session_id))
+            pipe.publish(self.channel, f"{self.node_id} {session_id}")
+            pipe.execute()
+        with self._lock:
+            self.memory_store.pop(session_id)
+
+    def get_context_keys(self, session_id):
+        """Get all context keys for a session"""
+        context = self.get_context(session_id)
+        return list(context.keys())
+
+    def clear_context_field(self, session_id, key):
+        """Remove a specific field from context"""
+        self._write(session_id, removed=[key])
+
+    def get_cache_stats(self):
+        """Get hit/miss/eviction counters for the near-cache"""
+        stats = self.memory_store.stats()
+        stats['invalidations'] = self.invalidations
+        stats['subscribed'] = self._subscribed
+        return stats
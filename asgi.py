@@ -0,0 +1,209 @@
+"""ASGI entry point for production serving
+
+The latency-bound chat and MCP endpoints are served by async Quart views
+that await MCP tool calls and LLM completions on the shared MCP pool loop,
+so a single worker handles many in-flight requests without parking a thread
+per request. Every other route is served by the Flask app in main.py through
+a thread-pooled WSGI adapter, so blocking Flask views run side by side
+(ASGI_WSGI_THREADS per worker) rather than one at a time. Both apps sign the session cookie with the same secret key,
+so a session started on one is visible to the other.
+
+Run with:
+    python asgi.py
+or
+    uvicorn asgi:application --workers 4 --port 5010
+"""
+import asyncio
+import json
+import os
+
+from a2wsgi import WSGIMiddleware
+from quart import Quart, Response, jsonify, request, session
+from werkzeug.exceptions import MethodNotAllowed, NotFound
+
+import main
+from main import (
+    MCP_ENDPOINT_SSE,
+    _begin_turn,
+    _finish_turn,
+    context_manager,
+    mcp_tools,
+    metrics,
+    orchestrator,
+)
+
+ASGI_HOST = os.getenv('ASGI_HOST', '0.0.0.0')
+ASGI_PORT = int(os.getenv('ASGI_PORT', '5010'))
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', '1'))
+# Maximum in-flight requests per worker before new ones get a 503 (0 = unlimited)
+ASGI_LIMIT_CONCURRENCY = int(os.getenv('ASGI_LIMIT_CONCURRENCY', '0'))
+# Threads per worker serving the routes that stay on the Flask app
+ASGI_WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', '32'))
+
+async_app = Quart(__name__)
+async_app.secret_key = main.app.secret_key
+
+
+@async_app.before_request
+async def start_request_timing():
+    """Collect per-phase timings for the Server-Timing header"""
+    metrics.begin_request()
+
+
+@async_app.teardown_request
+async def flush_context(exc):
+    """Persist write-behind context at the end of each request"""
+    await asyncio.to_thread(main.flush_context, exc)
+
+
+@async_app.route('/api/chat/message', methods=['POST'])
+async def send_message():
+    """Send a message and get agent response"""
+    data = await request.get_json()
+    message = data.get('message')
+
+    if not message:
+        return jsonify({'error': 'Message is required'}), 400
+
+    session_id = session.get('session_id')
+
+    if not session_id:
+        return jsonify({'error': 'No active session'}), 400
+
+    # SQLite and routing work is short and blocking, so it runs in a thread;
+    # tool calls and the LLM completion are awaited on the MCP pool loop.
+    # The batch spans the threads, so the turn's context is saved in one write
+    async with context_manager.batch_async():
+        context, history = await asyncio.to_thread(_begin_turn, session_id, message)
+        agent_id = await asyncio.to_thread(orchestrator.get_appropriate_agent, message)
+
+        agent_response = await mcp_tools.run_async(
+            orchestrator.process_with_agent_async(agent_id, message, context, history)
+        )
+        await asyncio.to_thread(_finish_turn, session_id, agent_id, agent_response, context)
+
+    response = jsonify({
+        'response': agent_response['response'],
+        'agent_id': agent_id,
+        'agent_name': agent_response['agent_name'],
+        'tools_used': agent_response['tools_used'],
+        'tool_calls': agent_response.get('tool_calls', []),
+        'session_id': session_id
+    })
+    server_timing = metrics.server_timing()
+    if server_timing:
+        response.headers['Server-Timing'] = server_timing
+    return response
+
+
+@async_app.route('/api/chat/message/stream', methods=['POST'])
+async def stream_message():
+    """Send a message and stream the agent response as server-sent events"""
+    data = await request.get_json()
+    message = data.get('message')
+
+    if not message:
+        return jsonify({'error': 'Message is required'}), 400
+
+    session_id = session.get('session_id')
+
+    if not session_id:
+        return jsonify({'error': 'No active session'}), 400
+
+    agent_id = await asyncio.to_thread(orchestrator.get_appropriate_agent, message)
+
+    async def generate():
+        # The turn's context changes are saved in one write when the stream ends
+        async with context_manager.batch_async():
+            context, history = await asyncio.to_thread(_begin_turn, session_id, message)
+            # Tool calls and the LLM stream are iterated on the MCP pool loop
+            events = mcp_tools.iterate_async(
+                orchestrator.stream_with_agent_async(agent_id, message, context, history)
+            )
+            async for event in events:
+                if event['type'] == 'done':
+                    await asyncio.to_thread(_finish_turn, session_id, agent_id, event, context)
+                    event['session_id'] = session_id
+                yield f"data: {json.dumps(event, default=str)}\n\n"
+
+    response = Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Stream for as long as the model does
+    response.timeout = None
+    return response
+
+
+@async_app.route('/api/mcp/tools')
+async def list_mcp_tools():
+    """API endpoint to list all MCP tools with details"""
+    try:
+        return jsonify({
+            'status': 'success',
+            'total_tools': mcp_tools.get_tools_count(),
+            'tools': mcp_tools.get_tools_list(),
+            'endpoint': MCP_ENDPOINT_SSE
+        })
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'error': str(e),
+            'total_tools': 0,
+            'tools': []
+        }), 500
+
+
+@async_app.route('/api/mcp/tool/<tool_id>/test', methods=['POST'])
+async def test_mcp_tool(tool_id):
+    """Test a specific MCP tool"""
+    try:
+        data = await request.get_json() or {}
+        parameters = data.get('parameters', {})
+
+        result = await mcp_tools.run_async(mcp_tools.call_tool_async(tool_id, parameters))
+
+        return jsonify({
+            'status': 'success',
+            'tool_id': tool_id,
+            'result': result
+        })
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'tool_id': tool_id,
+            'error': str(e)
+        }), 500
+
+
+wsgi_app = WSGIMiddleware(main.app, workers=ASGI_WSGI_THREADS)
+_async_routes = async_app.url_map.bind('localhost')
+
+
+def _is_async_route(scope):
+    try:
+        _async_routes.match(scope['path'], method=scope['method'])
+        return True
+    except (NotFound, MethodNotAllowed):
+        return False
+
+
+async def application(scope, receive, send):
+    """Dispatch async routes to Quart and everything else to the Flask app"""
+    if scope['type'] == 'http' and not _is_async_route(scope):
+        await wsgi_app(scope, receive, send)
+    else:
+        await async_app(scope, receive, send)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(
+        'asgi:application',
+        host=ASGI_HOST,
+        port=ASGI_PORT,
+        workers=WEB_CONCURRENCY,
+        limit_concurrency=ASGI_LIMIT_CONCURRENCY or None,
+    )
@@ -4,13 +4,22 @@ import json
 import asyncio
 import requests
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import Flask, Response, render_template, request, jsonify, session, redirect, url_for, stream_with_context
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 import uuid
+import hashlib
+import hmac
+import click
 
 # Import utility classes from agent_utils package
-from agent_utils import MCPToolsManager, SessionManager, ContextManager, AgentOrchestrator, DatabaseManager
+from agent_utils import MCPToolsManager, SessionManager, ContextManager, SharedContextManager, AgentOrchestrator, DatabaseManager
+from agent_utils.agents import HistoryAssembler, ResponseCache
+from agent_utils.database.archive import ChatArchive
+from agent_utils.database.chat_history_dao import ChatHistoryDAO
+from agent_utils.database.payload_codec import PayloadCodec
+from agent_utils.database.retention import RetentionManager
+from agent_utils.metrics import metrics
 
 # Load environment variables
 load_dotenv()
@@ -21,27 +30,119 @@ app.secret_key = os.getenv('SECRET_KEY', 'your-secret-key-here')
 # Configuration
 MCP_ENDPOINT_SSE = os.getenv('MCP_ENDPOINT_SSE', 'http://127.0.0.1:8000/sse')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+DATABASE_PATH = os.getenv('DATABASE_PATH', 'chat_sessions.db')
+# A postgresql:// URL stores everything in PostgreSQL instead, shared by all app nodes
+DATABASE_URL = os.getenv('DATABASE_URL')
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '8'))
+# Storage encoding for chat_history metadata/tool_calls: json, zlib or msgpack
+CHAT_PAYLOAD_ENCODING = os.getenv('CHAT_PAYLOAD_ENCODING', 'json')
+CHAT_PAYLOAD_MIN_BYTES = int(os.getenv('CHAT_PAYLOAD_MIN_BYTES', '256'))
+CONTEXT_WRITE_BEHIND = os.getenv('CONTEXT_WRITE_BEHIND', 'false').lower() in ('1', 'true', 'yes')
+CONTEXT_FLUSH_INTERVAL = float(os.getenv('CONTEXT_FLUSH_INTERVAL', '0'))
+CONTEXT_CACHE_SIZE = int(os.getenv('CONTEXT_CACHE_SIZE', '10000'))
+CONTEXT_CACHE_TTL = float(os.getenv('CONTEXT_CACHE_TTL', '3600'))
+CONTEXT_VERIFY_VERSIONS = os.getenv('CONTEXT_VERIFY_VERSIONS', 'false').lower() in ('1', 'true', 'yes')
+CONTEXT_REDIS_URL = os.getenv('CONTEXT_REDIS_URL', '')
+CONTEXT_REDIS_TTL = int(os.getenv('CONTEXT_REDIS_TTL', str(7 * 24 * 3600)))
+HISTORY_PAGE_SIZE = int(os.getenv('HISTORY_PAGE_SIZE', '50'))
+HISTORY_MAX_PAGE_SIZE = int(os.getenv('HISTORY_MAX_PAGE_SIZE', '200'))
+SEARCH_PAGE_SIZE = int(os.getenv('SEARCH_PAGE_SIZE', '20'))
+SEARCH_MAX_PAGE_SIZE = int(os.getenv('SEARCH_MAX_PAGE_SIZE', '100'))
+# Earlier turns sent to the LLM: recent turns within a token budget plus a rolling summary
+PROMPT_HISTORY_TOKENS = int(os.getenv('PROMPT_HISTORY_TOKENS', '1200'))
+PROMPT_SUMMARY_TOKENS = int(os.getenv('PROMPT_SUMMARY_TOKENS', '300'))
+PROMPT_HISTORY_MAX_MESSAGES = int(os.getenv('PROMPT_HISTORY_MAX_MESSAGES', '12'))
+SEMANTIC_ROUTING = os.getenv('SEMANTIC_ROUTING', 'false').lower() in ('1', 'true', 'yes')
+SEMANTIC_ROUTING_THRESHOLD = float(os.getenv('SEMANTIC_ROUTING_THRESHOLD', '0.35'))
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+LLM_CACHE_SIZE = int(os.getenv('LLM_CACHE_SIZE', '1024'))
+LLM_CACHE_TTL = float(os.getenv('LLM_CACHE_TTL', '300'))
+MCP_POOL_SIZE = int(os.getenv('MCP_POOL_SIZE', '4'))
+MCP_HEALTH_CHECK_INTERVAL = float(os.getenv('MCP_HEALTH_CHECK_INTERVAL', '30'))
+# Per-tool result cache TTLs, e.g. "schedule_lookup=60,offer_manager=300" (0 disables)
+MCP_TOOL_CACHE_TTLS = {
+    name.strip(): float(ttl)
+    for name, ttl in (item.split('=') for item in os.getenv('MCP_TOOL_CACHE_TTLS', '').split(',') if '=' in item)
+}
+MCP_TOOLS_SNAPSHOT_PATH = os.getenv('MCP_TOOLS_SNAPSHOT_PATH', 'mcp_tools_snapshot.json')
+MCP_TOOLS_REFRESH_INTERVAL = float(os.getenv('MCP_TOOLS_REFRESH_INTERVAL', '300'))
+MCP_TOOL_TIMEOUT = float(os.getenv('MCP_TOOL_TIMEOUT', '10'))
+MCP_MAX_TOOL_CONCURRENCY = int(os.getenv('MCP_MAX_TOOL_CONCURRENCY', '4'))
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+# Required as the X-Admin-Token header on /api/admin/*, /api/search and the cache
+# stats/invalidation endpoints; without
+# a token those endpoints are refused unless ADMIN_ALLOW_UNAUTHENTICATED is set
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+ADMIN_ALLOW_UNAUTHENTICATED = os.getenv('ADMIN_ALLOW_UNAUTHENTICATED', 'false').lower() in ('1', 'true', 'yes')
+# Sessions inactive this long are moved to gzip archives by the retention job (0 = keep forever)
+RETENTION_MAX_AGE_DAYS = float(os.getenv('RETENTION_MAX_AGE_DAYS', '90'))
+RETENTION_ARCHIVE_DIR = os.getenv('RETENTION_ARCHIVE_DIR', 'archives')
+RETENTION_BATCH_SIZE = int(os.getenv('RETENTION_BATCH_SIZE', '200'))
+
+metrics.enabled = METRICS_ENABLED
 
 # Initialize OpenAI client with proper error handling
 try:
     if OPENAI_API_KEY:
         client = OpenAI(api_key=OPENAI_API_KEY)
+        # Used by the async views in asgi.py
+        async_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
     else:
         client = None
+        async_client = None
         print("Warning: No OpenAI API key provided. AI responses will be simulated.")
 except Exception as e:
     print(f"Warning: Could not initialize OpenAI client: {e}")
     client = None
+    async_client = None
+
+try:
+    payload_codec = PayloadCodec(CHAT_PAYLOAD_ENCODING, min_bytes=CHAT_PAYLOAD_MIN_BYTES)
+except ImportError as e:
+    print(f"Warning: {e}. Storing chat payloads as zlib-compressed JSON instead.")
+    payload_codec = PayloadCodec('zlib', min_bytes=CHAT_PAYLOAD_MIN_BYTES)
 
 # Initialize database first using DatabaseManager
-db_manager = DatabaseManager()
+db_manager = DatabaseManager(DATABASE_URL or DATABASE_PATH, pool_size=DB_POOL_SIZE, payload_codec=payload_codec)
 db_manager.init_database()
 
 # Initialize components after database is ready
-mcp_tools = MCPToolsManager(MCP_ENDPOINT_SSE)
-orchestrator = AgentOrchestrator(mcp_tools, client)
-session_manager = SessionManager()
-context_manager = ContextManager()
+mcp_tools = MCPToolsManager(MCP_ENDPOINT_SSE, pool_size=MCP_POOL_SIZE,
+                            health_check_interval=MCP_HEALTH_CHECK_INTERVAL,
+                            cache_policies=MCP_TOOL_CACHE_TTLS, snapshot_path=MCP_TOOLS_SNAPSHOT_PATH,
+                            refresh_interval=MCP_TOOLS_REFRESH_INTERVAL)
+orchestrator = AgentOrchestrator(mcp_tools, client, tool_timeout=MCP_TOOL_TIMEOUT,
+                                 max_tool_concurrency=MCP_MAX_TOOL_CONCURRENCY, db_manager=db_manager,
+                                 semantic_routing=SEMANTIC_ROUTING, semantic_threshold=SEMANTIC_ROUTING_THRESHOLD,
+                                 response_cache=ResponseCache(LLM_CACHE_SIZE, LLM_CACHE_TTL) if LLM_CACHE_ENABLED else None,
+                                 async_openai_client=async_client)
+session_manager = SessionManager(db_manager)
+if CONTEXT_REDIS_URL:
+    # Context shared by every worker and node, with a per-process near-cache
+    context_manager = SharedContextManager(CONTEXT_REDIS_URL, ttl=CONTEXT_REDIS_TTL,
+                                           cache_size=CONTEXT_CACHE_SIZE, cache_ttl=CONTEXT_CACHE_TTL)
+else:
+    context_manager = ContextManager(db_manager, write_behind=CONTEXT_WRITE_BEHIND,
+                                     flush_interval=CONTEXT_FLUSH_INTERVAL, cache_size=CONTEXT_CACHE_SIZE,
+                                     cache_ttl=CONTEXT_CACHE_TTL, verify_versions=CONTEXT_VERIFY_VERSIONS)
+chat_archive = ChatArchive(db_manager=db_manager)
+chat_history = ChatHistoryDAO(db_manager=db_manager)
+retention = RetentionManager(db_manager=db_manager, archive_dir=RETENTION_ARCHIVE_DIR,
+                             max_age_days=RETENTION_MAX_AGE_DAYS, batch_size=RETENTION_BATCH_SIZE)
+history_assembler = HistoryAssembler(session_manager, context_manager, token_budget=PROMPT_HISTORY_TOKENS,
+                                     summary_budget=PROMPT_SUMMARY_TOKENS,
+                                     max_messages=PROMPT_HISTORY_MAX_MESSAGES)
+
+@app.before_request
+def start_request_timing():
+    """Collect per-phase timings for the Server-Timing header"""
+    metrics.begin_request()
+
+@app.teardown_request
+def flush_context(exc):
+    """Persist write-behind context at the end of each request"""
+    if CONTEXT_WRITE_BEHIND and not CONTEXT_FLUSH_INTERVAL:
+        context_manager.flush()
 
 @app.route('/')
 def index():
@@ -75,8 +176,10 @@ def start_chat():
     session['customer_id'] = customer_id
 
     # Initialize context
-    context_manager.update_context(session_id, 'customer_id', customer_id)
-    context_manager.update_context(session_id, 'session_start', datetime.now().isoformat())
+    context_manager.update_many(session_id, {
+        'customer_id': customer_id,
+        'session_start': datetime.now().isoformat()
+    })
 
     return jsonify({
         'session_id': session_id,
@@ -99,21 +202,74 @@ def send_message():
     if not session_id:
         return jsonify({'error': 'No active session'}), 400
 
-    # Save user message
-    session_manager.add_message(session_id, 'user', message)
+    # The turn's context changes (history summary, counters) are saved in one write
+    with context_manager.batch():
+        context, history = _begin_turn(session_id, message)
+        agent_id = orchestrator.get_appropriate_agent(message)
+
+        # Process with agent
+        agent_response = orchestrator.process_with_agent(agent_id, message, context, history)
+        _finish_turn(session_id, agent_id, agent_response, context)
+
+    response = jsonify({
+        'response': agent_response['response'],
+        'agent_id': agent_id,
+        'agent_name': agent_response['agent_name'],
+        'tools_used': agent_response['tools_used'],
+        'tool_calls': agent_response.get('tool_calls', []),
+        'session_id': session_id
+    })
+    server_timing = metrics.server_timing()
+    if server_timing:
+        response.headers['Server-Timing'] = server_timing
+    return response
+
+@app.route('/api/chat/message/stream', methods=['POST'])
+def stream_message():
+    """Send a message and stream the agent response as server-sent events"""
+    data = request.get_json()
+    message = data.get('message')
+
+    if not message:
+        return jsonify({'error': 'Message is required'}), 400
+
+    session_id = session.get('session_id')
+
+    if not session_id:
+        return jsonify({'error': 'No active session'}), 400
 
-    # Determine appropriate agent
     agent_id = orchestrator.get_appropriate_agent(message)
 
-    # Get current context
-    context = context_manager.get_context(session_id)
+    def generate():
+        # The turn's context changes are saved in one write when the stream ends
+        with context_manager.batch():
+            context, history = _begin_turn(session_id, message)
+            for event in orchestrator.stream_with_agent(agent_id, message, context, history):
+                if event['type'] == 'done':
+                    _finish_turn(session_id, agent_id, event, context)
+                    event['session_id'] = session_id
+                yield f"data: {json.dumps(event, default=str)}\n\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def _begin_turn(session_id, message):
+    """Save the user message and return the updated session context and prompt history"""
+    # Assembled before the new message is saved, so it holds earlier turns only
+    history = history_assembler.assemble(session_id)
+    session_manager.add_message(session_id, 'user', message)
+
+    # A copy for this turn; the stored context changes only in _finish_turn
+    context = dict(context_manager.get_context(session_id))
     context['last_message'] = message
     context['message_count'] = context.get('message_count', 0) + 1
+    return context, history
 
-    # Process with agent
-    agent_response = orchestrator.process_with_agent(agent_id, message, context)
-
-    # Save agent response
+def _finish_turn(session_id, agent_id, agent_response, context):
+    """Save the agent response and update the session context"""
     session_manager.add_message(
         session_id,
         'agent',
@@ -123,30 +279,53 @@ def send_message():
         agent_response.get('tool_calls', [])
     )
 
-    # Update context
-    context_manager.update_context(session_id, 'last_agent', agent_id)
-    context_manager.update_context(session_id, 'last_response', agent_response['response'])
-    context_manager.update_context(session_id, 'message_count', context['message_count'])
-
-    return jsonify({
-        'response': agent_response['response'],
-        'agent_id': agent_id,
-        'agent_name': agent_response['agent_name'],
-        'tools_used': agent_response['tools_used'],
-        'tool_calls': agent_response.get('tool_calls', []),
-        'session_id': session_id
-    })
+    # Only the fields this turn changed are written, and the count is
+    # incremented rather than overwritten, so concurrent turns do not race
+    context_manager.update_many(session_id, {
+        'last_message': context['last_message'],
+        'last_agent': agent_id,
+        'last_response': agent_response['response']
+    }, increments={'message_count': 1})
 
 @app.route('/api/chat/history')
 def get_chat_history():
-    """Get chat history for current session"""
+    """Get a page of chat history for current session
+
+    Query parameters: limit (page size), before (id cursor for older pages)
+    and since_id (only messages newer than this id). Responses carry an ETag
+    and return 304 when If-None-Match matches.
+    """
     session_id = session.get('session_id')
 
     if not session_id:
         return jsonify({'error': 'No active session'}), 400
 
-    history = session_manager.get_chat_history(session_id)
-    return jsonify(history)
+    limit = max(1, min(request.args.get('limit', HISTORY_PAGE_SIZE, type=int), HISTORY_MAX_PAGE_SIZE))
+    before_id = request.args.get('before', type=int)
+    since_id = request.args.get('since_id', type=int)
+
+    # Validate against a cheap index-only summary before loading any rows
+    message_count, last_id = session_manager.get_history_state(session_id)
+    etag = hashlib.sha1(
+        f"{session_id}:{message_count}:{last_id}:{limit}:{before_id}:{since_id}".encode()
+    ).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+
+    messages, has_more = session_manager.get_chat_history_page(
+        session_id, limit=limit, before_id=before_id, after_id=since_id
+    )
+
+    response = jsonify({
+        'messages': [message.to_dict() for message in messages],
+        'has_more': has_more,
+        'before': messages[0].id if messages else before_id,
+        'last_id': last_id
+    })
+    response.set_etag(etag)
+    return response
 
 @app.route('/api/agents')
 def get_agents():
@@ -161,35 +340,160 @@ def get_available_tools():
 @app.route('/api/visualization/session/<session_id>')
 def get_session_visualization(session_id):
     """Get visualization data for a session"""
-    history = session_manager.get_chat_history(session_id)
+    # Served from aggregates maintained on write, so cost is independent of session length
+    summary = session_manager.get_session_summary(session_id)
     context = context_manager.get_context(session_id)
 
-    # Prepare visualization data
-    agents_used = list(set([msg['agent_id'] for msg in history if msg['agent_id']]))
-    tools_used = []
-    for msg in history:
-        if msg.get('tool_calls'):
-            tools_used.extend([call['tool'] for call in msg['tool_calls']])
-
     viz_data = {
         'session_id': session_id,
-        'message_count': len(history),
-        'agents_used': agents_used,
-        'tools_used': list(set(tools_used)),
+        'message_count': summary['message_count'],
+        'agents_used': list(summary['agent_counts'].keys()),
+        'tools_used': list(summary['tool_counts'].keys()),
+        'agent_counts': summary['agent_counts'],
+        'tool_counts': summary['tool_counts'],
         'context_keys': list(context.keys()),
-        'timeline': [
-            {
-                'timestamp': msg['timestamp'],
-                'type': msg['type'],
-                'agent': msg['agent_id'],
-                'tool_calls': len(msg.get('tool_calls', []))
-            }
-            for msg in history
-        ]
+        'timeline': summary['timeline']
     }
 
     return jsonify(viz_data)
 
+def _admin_denied():
+    """Return an error response unless the request carries the admin token"""
+    if not ADMIN_TOKEN:
+        if ADMIN_ALLOW_UNAUTHENTICATED:
+            return None
+        return jsonify({'error': 'Admin endpoints are disabled until ADMIN_TOKEN is set'}), 403
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+        return jsonify({'error': 'Admin token required'}), 403
+    return None
+
+@app.route('/api/search')
+def search_history():
+    """Full-text search across all conversations
+
+    Query parameters: q (terms, all required; end a term with * for prefix
+    matches), customer_id, agent_id, since, until (ISO dates), limit and page.
+    """
+    denied = _admin_denied()
+    if denied:
+        return denied
+    if not chat_history.search_available():
+        return jsonify({'error': 'Full-text search is unavailable: SQLite was built without FTS5'}), 501
+
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Query parameter q is required'}), 400
+
+    limit = max(1, min(request.args.get('limit', SEARCH_PAGE_SIZE, type=int), SEARCH_MAX_PAGE_SIZE))
+    page = max(1, request.args.get('page', 1, type=int))
+    try:
+        since, until = ChatArchive.normalize_dates(request.args.get('since'), request.args.get('until'))
+    except ValueError:
+        return jsonify({'error': 'since and until must be ISO dates'}), 400
+
+    results, has_more = chat_history.search(
+        query, customer_id=request.args.get('customer_id'), agent_id=request.args.get('agent_id'),
+        since=since, until=until, limit=limit, offset=(page - 1) * limit
+    )
+    return jsonify({'results': results, 'page': page, 'limit': limit, 'has_more': has_more})
+
+@app.route('/api/admin/export')
+def export_history():
+    """Stream sessions and chat history as NDJSON, or gzip JSONL with format=jsonl.gz"""
+    denied = _admin_denied()
+    if denied:
+        return denied
+
+    customer_id = request.args.get('customer_id')
+    since = request.args.get('since')
+    until = request.args.get('until')
+    compress = request.args.get('format') == 'jsonl.gz'
+    try:
+        # Validate the dates before the response starts streaming
+        ChatArchive.normalize_dates(since, until)
+    except ValueError:
+        return jsonify({'error': 'since and until must be ISO dates'}), 400
+
+    if compress:
+        body = chat_archive.iter_gzip(customer_id, since, until)
+        mimetype, filename = 'application/gzip', 'chat_export.jsonl.gz'
+    else:
+        body = chat_archive.iter_ndjson(customer_id, since, until)
+        mimetype, filename = 'application/x-ndjson', 'chat_export.ndjson'
+    return Response(body, mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+@app.cli.command('export-history')
+@click.argument('output')
+@click.option('--customer', 'customer_id', help='Only this customer\'s sessions and messages')
+@click.option('--since', help='ISO date/datetime, inclusive')
+@click.option('--until', help='ISO date/datetime, exclusive')
+def export_history_command(output, customer_id, since, until):
+    """Export sessions and chat history to a JSON Lines file (.gz to compress)"""
+    written = chat_archive.export_to_file(output, customer_id, since, until)
+    click.echo(f"📦 Wrote {written} bytes to {output}")
+
+@app.cli.command('import-history')
+@click.argument('archive')
+@click.option('--batch-size', default=5000, show_default=True, help='Records per transaction')
+def import_history_command(archive, batch_size):
+    """Import sessions and chat history from a JSON Lines archive (optionally gzipped)"""
+    sessions, messages = chat_archive.import_file(archive, batch_size)
+    click.echo(f"📥 Imported {sessions} sessions and {messages} messages from {archive}")
+
+@app.cli.command('encode-payloads')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows per transaction')
+def encode_payloads_command(batch_size):
+    """Re-encode stored metadata and tool_calls with CHAT_PAYLOAD_ENCODING"""
+    scanned, rewritten = chat_history.reencode_payloads(batch_size)
+    click.echo(f"🗜️ Re-encoded {rewritten} of {scanned} messages as {payload_codec.encoding}; "
+               f"run the retention job to return the freed pages")
+
+@app.route('/api/admin/retention/run', methods=['POST'])
+def run_retention():
+    """Archive inactive sessions, clean orphaned rows and reclaim space"""
+    denied = _admin_denied()
+    if denied:
+        return denied
+
+    data = request.get_json(silent=True) or {}
+    report = retention.run(max_sessions=data.get('max_sessions'), vacuum=data.get('vacuum', True))
+    return jsonify({'status': 'success', 'report': report})
+
+@app.cli.command('retention')
+@click.option('--max-sessions', type=int, help='Archive at most this many sessions')
+@click.option('--no-vacuum', is_flag=True, help='Skip the incremental vacuum')
+@click.option('--enable-incremental-vacuum', is_flag=True,
+              help='Convert an existing database to incremental vacuum first (full, blocking VACUUM)')
+def retention_command(max_sessions, no_vacuum, enable_incremental_vacuum):
+    """Run the retention job and print its report"""
+    if enable_incremental_vacuum:
+        retention.enable_incremental_vacuum()
+    report = retention.run(max_sessions=max_sessions, vacuum=not no_vacuum)
+    click.echo(f"🧹 Archived {report['sessions_archived']} sessions / {report['messages_archived']} messages"
+               f"{' to ' + report['archive_path'] if report['archive_path'] else ''}")
+    click.echo(f"🧹 Removed {report['contexts_deleted']} orphaned contexts, {report['summaries_deleted']} summaries")
+    click.echo(f"🧹 Reclaimed {report['bytes_reclaimed']} bytes "
+               f"(file {report['file_bytes_before']} -> {report['file_bytes_after']}) in {report['seconds']}s")
+
+@app.route('/api/cache/stats')
+def get_cache_stats():
+    """Get hit/miss/eviction counters for the in-process caches"""
+    denied = _admin_denied()
+    if denied:
+        return denied
+
+    return jsonify({
+        'llm_responses': orchestrator.response_cache.stats() if orchestrator.response_cache else None,
+        'tool_results': mcp_tools.tool_cache.stats(),
+        'context': context_manager.get_cache_stats()
+    })
+
+@app.route('/metrics')
+def get_metrics():
+    """Phase latency histograms in the Prometheus text format"""
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/context/<session_id>')
 def get_session_context(session_id):
     """Get context for a session"""
@@ -243,5 +547,16 @@ def test_mcp_tool(tool_id):
             'error': str(e)
         }), 500
 
+@app.route('/api/mcp/cache/invalidate', methods=['POST'])
+def invalidate_mcp_cache():
+    """Drop cached tool results for a call, a tool, or all tools"""
+    denied = _admin_denied()
+    if denied:
+        return denied
+
+    data = request.get_json() or {}
+    removed = mcp_tools.invalidate_tool_cache(data.get('tool'), data.get('parameters'))
+    return jsonify({'status': 'success', 'removed': removed})
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5010)
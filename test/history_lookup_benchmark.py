@@ -0,0 +1,100 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent_utils.database import DatabaseManager
+from agent_utils.database.chat_history_dao import ChatHistoryDAO
+from agent_utils.session_manager import SessionManager
+
+MESSAGES_PER_SESSION = 20
+
+
+def grow_table(db_manager, start_row, target_rows, sessions_per_customer=5):
+    """Insert synthetic sessions and messages until chat_history has target_rows rows"""
+    with db_manager.connection() as conn:
+        session_rows = []
+        message_rows = []
+        for row in range(start_row, target_rows):
+            session_index = row // MESSAGES_PER_SESSION
+            session_id = f"session-{session_index}"
+            if row % MESSAGES_PER_SESSION == 0:
+                session_rows.append((session_id, f"customer-{session_index // sessions_per_customer}", '{}'))
+            message_rows.append((
+                session_id,
+                'user' if row % 2 == 0 else 'agent',
+                f"Synthetic message {row}",
+                None if row % 2 == 0 else 'support_agent',
+                '{}',
+                '[]'
+            ))
+        conn.executemany('INSERT INTO sessions (id, customer_id, metadata) VALUES (?, ?, ?)', session_rows)
+        conn.executemany('''
+            INSERT INTO chat_history (session_id, message_type, content, agent_id, metadata, tool_calls)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', message_rows)
+
+
+def time_lookups(lookup, session_count, iterations):
+    """Average lookup time in milliseconds over random sessions"""
+    started = time.perf_counter()
+    for _ in range(iterations):
+        lookup(f"session-{random.randrange(session_count)}")
+    return (time.perf_counter() - started) * 1000 / iterations
+
+
+def run_benchmark(sizes, iterations, database_url=None):
+    """Measure history lookups as chat_history grows
+
+    Runs against a throwaway SQLite file, or against database_url (e.g. a
+    local PostgreSQL), whose tables are dropped before and after.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_manager = DatabaseManager(database_url or os.path.join(tmpdir, 'benchmark.db'))
+        if database_url:
+            db_manager.drop_all_tables()
+        db_manager.init_database()
+        session_manager = SessionManager(db_manager)
+        history_dao = ChatHistoryDAO(db_manager=db_manager)
+
+        print(f"🗄️ Schema version: {db_manager.get_schema_version()}")
+        print(f"{'rows':>10} | {'history ms':>10} | {'latest ms':>10} | {'by agent ms':>11} | {'by customer ms':>14}")
+
+        rows = 0
+        for size in sizes:
+            grow_table(db_manager, rows, size)
+            rows = size
+            session_count = rows // MESSAGES_PER_SESSION
+            customer_count = max(1, session_count // 5)
+
+            history_ms = time_lookups(session_manager.get_chat_history, session_count, iterations)
+            latest_ms = time_lookups(history_dao.get_latest_messages, session_count, iterations)
+            agent_ms = time_lookups(
+                lambda session_id: history_dao.get_messages_by_agent(session_id, 'support_agent'),
+                session_count, iterations
+            )
+            customer_ms = time_lookups(
+                lambda _: session_manager.get_sessions_by_customer(f"customer-{random.randrange(customer_count)}"),
+                session_count, iterations
+            )
+            print(f"{rows:>10} | {history_ms:>10.3f} | {latest_ms:>10.3f} | {agent_ms:>11.3f} | {customer_ms:>14.3f}")
+
+        if database_url:
+            db_manager.drop_all_tables()
+        db_manager.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark chat history lookups as the table grows")
+    parser.add_argument('--sizes', default='10000,100000,1000000',
+                        help='Comma-separated chat_history row counts to measure at')
+    parser.add_argument('--iterations', type=int, default=500, help='Lookups per measurement')
+    parser.add_argument('--database-url', help='Benchmark this postgresql:// database instead of a temporary SQLite file '
+                                               '(its chat tables are dropped)')
+    args = parser.parse_args()
+
+    run_benchmark([int(size) for size in args.sizes.split(',')], args.iterations, args.database_url)
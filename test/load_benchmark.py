@@ -0,0 +1,276 @@
+import argparse
+import functools
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# Every tool the agents can call, plus the one test/fastmcp_test.py uses
+TOOLS = [
+    'payment_processor', 'balance_checker', 'transaction_history',
+    'offer_manager', 'rewards_calculator', 'promo_validator',
+    'schedule_lookup', 'route_planner', 'real_time_tracking',
+    'ticket_manager', 'faq_search', 'escalation_handler',
+    'health_check',
+]
+
+# Customer turns cycle through these so every agent and most tools are exercised
+MESSAGES = [
+    "What is my card balance?",
+    "Show my recent transactions",
+    "Are there any offers this week?",
+    "How many reward points do I have?",
+    "When is the next bus on route 42?",
+    "Plan a route to the airport",
+    "The app keeps crashing, can you help?",
+    "I want to pay my fare",
+]
+
+PHASES = ['routing', 'db', 'tools', 'llm']
+
+
+def parse_latencies(spec):
+    """Parse "default=50,balance_checker=200" (milliseconds) into seconds per tool"""
+    latencies = {'default': 0.05}
+    for item in spec.split(','):
+        if '=' in item:
+            name, ms = item.split('=')
+            latencies[name.strip()] = float(ms) / 1000
+    return latencies
+
+
+# --- Stand-in servers (run in a child process so they don't share the app's GIL) ---
+
+def serve_llm(port, latency, response_tokens):
+    """Serve a minimal OpenAI-compatible /v1/chat/completions endpoint"""
+    content = ' '.join(['token'] * response_tokens)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            time.sleep(latency)
+            body = json.dumps({
+                'id': 'chatcmpl-benchmark',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': request.get('model', 'benchmark'),
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': content},
+                    'finish_reason': 'stop'
+                }],
+                'usage': {'prompt_tokens': 0, 'completion_tokens': response_tokens, 'total_tokens': response_tokens}
+            }).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    ThreadingHTTPServer(('127.0.0.1', port), Handler).serve_forever()
+
+
+def serve_mcp(port, latencies, payload_bytes):
+    """Serve a FastMCP SSE server whose tools sleep and return a fixed-size payload"""
+    import asyncio
+    from fastmcp import FastMCP
+
+    mcp = FastMCP("benchmark")
+    payload = 'x' * payload_bytes
+
+    def make_tool(tool_name):
+        delay = latencies.get(tool_name, latencies['default'])
+
+        async def tool(customer_id: str = "") -> dict:
+            await asyncio.sleep(delay)
+            return {'tool': tool_name, 'customer_id': customer_id, 'data': payload}
+        return tool
+
+    for tool_name in TOOLS:
+        mcp.tool(make_tool(tool_name), name=tool_name)
+    mcp.run(transport='sse', host='127.0.0.1', port=port, show_banner=False, log_level='warning')
+
+
+def wait_for_port(port, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Stand-in server on port {port} did not start")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+# --- Phase timing ---
+
+_current = threading.local()
+
+
+def timed(phase, fn):
+    """Wrap fn so its wall time is added to the calling request's phase totals"""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            phases = getattr(_current, 'phases', None)
+            if phases is not None:
+                phases[phase] = phases.get(phase, 0.0) + time.perf_counter() - started
+    return wrapper
+
+
+def instrument(main):
+    """Patch the app's components so each chat turn records its phase timings"""
+    main._begin_turn = timed('db', main._begin_turn)
+    main._finish_turn = timed('db', main._finish_turn)
+    main.orchestrator.get_appropriate_agent = timed('routing', main.orchestrator.get_appropriate_agent)
+    main.mcp_tools.call_tools = timed('tools', main.mcp_tools.call_tools)
+    if main.orchestrator.client is None:
+        raise RuntimeError("The OpenAI client failed to initialize; see the warning above")
+    completions = main.orchestrator.client.chat.completions
+    completions.create = timed('llm', completions.create)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))]
+
+
+# --- Load generation ---
+
+def run_customer(app, customer_index, turns):
+    """Start a session and send turns messages, returning per-turn (total, phases) samples"""
+    client = app.test_client()
+    response = client.post('/api/chat/start', json={'customer_id': str(customer_index)})
+    if response.status_code != 200:
+        raise RuntimeError(f"Chat start failed: {response.status_code}")
+
+    samples = []
+    for turn in range(turns):
+        _current.phases = {}
+        started = time.perf_counter()
+        response = client.post('/api/chat/message', json={
+            'message': MESSAGES[(customer_index + turn) % len(MESSAGES)]
+        })
+        elapsed = time.perf_counter() - started
+        if response.status_code != 200:
+            raise RuntimeError(f"Chat message failed: {response.status_code}")
+        samples.append((elapsed, _current.phases))
+        _current.phases = None
+    return samples
+
+
+def run_benchmark(args):
+    mcp_port, llm_port = free_port(), free_port()
+    stand_ins = subprocess.Popen([
+        sys.executable, os.path.abspath(__file__), '--serve-stand-ins',
+        '--mcp-port', str(mcp_port), '--llm-port', str(llm_port),
+        '--tool-latency', args.tool_latency, '--payload-bytes', str(args.payload_bytes),
+        '--llm-latency', str(args.llm_latency), '--response-tokens', str(args.response_tokens),
+    ])
+    try:
+        wait_for_port(mcp_port)
+        wait_for_port(llm_port)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            os.environ.update({
+                'DATABASE_PATH': os.path.join(tmpdir, 'benchmark.db'),
+                'MCP_ENDPOINT_SSE': f'http://127.0.0.1:{mcp_port}/sse',
+                'MCP_TOOLS_SNAPSHOT_PATH': os.path.join(tmpdir, 'mcp_tools_snapshot.json'),
+                'OPENAI_API_KEY': 'benchmark',
+                'OPENAI_BASE_URL': f'http://127.0.0.1:{llm_port}/v1',
+                'LLM_CACHE_ENABLED': 'true' if args.caches else 'false',
+            })
+            # Never write benchmark sessions into a configured shared database or context store
+            os.environ.pop('DATABASE_URL', None)
+            os.environ.pop('CONTEXT_REDIS_URL', None)
+            if not args.caches:
+                os.environ['MCP_TOOL_CACHE_TTLS'] = ','.join(f'{tool}=0' for tool in TOOLS)
+
+            import main
+            main.mcp_tools.refresh_tools()
+            instrument(main)
+
+            # Warm up connections and code paths outside the measurement
+            run_customer(main.app, 0, 1)
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(args.customers) as executor:
+                results = list(executor.map(
+                    lambda index: run_customer(main.app, index, args.turns),
+                    range(1, args.customers + 1)
+                ))
+            wall = time.perf_counter() - started
+
+            samples = [sample for customer in results for sample in customer]
+            report(samples, wall, args)
+            main.mcp_tools.close()
+            main.db_manager.close()
+    finally:
+        stand_ins.terminate()
+        stand_ins.wait()
+
+
+def report(samples, wall, args):
+    """Print throughput and per-phase latency percentiles in milliseconds"""
+    print(f"👥 {args.customers} customers x {args.turns} turns = {len(samples)} messages in {wall:.2f}s")
+    print(f"🚀 Throughput: {len(samples) / wall:.1f} messages/s")
+
+    series = {'total': [total for total, _ in samples]}
+    for phase in PHASES:
+        series[phase] = [phases.get(phase, 0.0) for _, phases in samples]
+    series['other'] = [total - sum(phases.values()) for total, phases in samples]
+
+    print(f"{'phase':<8} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | {'max ms':>8}")
+    for name, values in series.items():
+        print(f"{name:<8} | {percentile(values, 50) * 1000:>8.2f} | {percentile(values, 95) * 1000:>8.2f} | "
+              f"{percentile(values, 99) * 1000:>8.2f} | {max(values) * 1000:>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the chat API against local MCP and LLM stand-ins")
+    parser.add_argument('--customers', type=int, default=16, help='Concurrent simulated customers')
+    parser.add_argument('--turns', type=int, default=10, help='Messages sent by each customer')
+    parser.add_argument('--tool-latency', default='default=50',
+                        help='Per-tool latency in ms, e.g. "default=50,balance_checker=200"')
+    parser.add_argument('--payload-bytes', type=int, default=512, help='Size of each tool result payload')
+    parser.add_argument('--llm-latency', type=float, default=0.2, help='Fake LLM latency in seconds')
+    parser.add_argument('--response-tokens', type=int, default=60, help='Words in each fake LLM reply')
+    parser.add_argument('--caches', action='store_true', help='Keep the LLM and tool result caches enabled')
+    parser.add_argument('--serve-stand-ins', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--mcp-port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--llm-port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_stand_ins:
+        threading.Thread(
+            target=serve_llm, args=(args.llm_port, args.llm_latency, args.response_tokens), daemon=True
+        ).start()
+        serve_mcp(args.mcp_port, parse_latencies(args.tool_latency), args.payload_bytes)
+    else:
+        run_benchmark(args)
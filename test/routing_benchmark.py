@@ -0,0 +1,113 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent_utils.agents.agent_orchestrator import ROUTING_KEYWORDS_PATH
+from agent_utils.agents.router import KeywordRouter
+
+# (message, expected agent); includes inflected, off-topic and ambiguous
+# messages that keyword routing gets wrong, so the accuracy is not flattering
+CORPUS = [
+    ("I want to pay my fare", 'payment_agent'),
+    ("What is my card balance?", 'payment_agent'),
+    ("Can I get a refund for yesterday's trip?", 'payment_agent'),
+    ("Show my recent transactions", 'payment_agent'),
+    ("My payment failed twice", 'payment_agent'),
+    ("Are there any offers this week?", 'offers_agent'),
+    ("How many reward points do I have?", 'offers_agent'),
+    ("Is there a student discount?", 'offers_agent'),
+    ("Any deals on monthly passes?", 'offers_agent'),
+    ("Tell me about current promotions", 'offers_agent'),
+    ("When is the next bus to downtown?", 'bus_schedule_agent'),
+    ("What's the schedule for route 42?", 'bus_schedule_agent'),
+    ("Arrival time at Central Station", 'bus_schedule_agent'),
+    ("Which buses run after midnight?", 'bus_schedule_agent'),
+    ("Departure times from the airport", 'bus_schedule_agent'),
+    ("I sometimes lose my ticket, what should I do?", 'support_agent'),
+    ("How do I update my email address?", 'support_agent'),
+    ("The app keeps crashing", 'support_agent'),
+    ("Can someone help me with a complaint?", 'support_agent'),
+    ("Is the payphone at the stop working?", 'support_agent'),
+    ("My cardigan was lost, who do I contact?", 'support_agent'),
+    ("Where do I report an ideal location for a new stop?", 'support_agent'),
+    ("Please reroute my complaint to a manager", 'support_agent'),
+    # Inflected and compound forms
+    ("I was refunded the wrong amount", 'payment_agent'),
+    ("Paying by phone doesn't work", 'payment_agent'),
+    ("Why was my card declined?", 'payment_agent'),
+    ("Is my ticket discounted?", 'offers_agent'),
+    ("I've earned rewards but can't redeem them", 'offers_agent'),
+    ("Where is the timetable?", 'bus_schedule_agent'),
+    ("My trip was rescheduled, what is the new time?", 'bus_schedule_agent'),
+    ("Which buses are scheduled on Sunday?", 'bus_schedule_agent'),
+    # Off-topic
+    ("Hello", 'support_agent'),
+    ("What's the weather like today?", 'support_agent'),
+    ("Can you recommend a restaurant near the station?", 'support_agent'),
+    ("Thanks, that's all", 'support_agent'),
+    ("I had a great time on my holiday", 'support_agent'),
+    # Ambiguous or needing more than keywords
+    ("I left my umbrella on the bus", 'support_agent'),
+    ("The driver was rude and the bus was late", 'support_agent'),
+    ("Money was taken from my account twice", 'payment_agent'),
+    ("I lost my bus pass, can I get a refund on the balance?", 'payment_agent'),
+    ("My card was charged but the bus never arrived", 'payment_agent'),
+    ("Is there a discount if my bus is always late?", 'offers_agent'),
+    ("Can I use my points to pay for a ticket?", 'offers_agent'),
+]
+
+
+def legacy_route(message):
+    """The original cascading substring router, kept for comparison"""
+    message_lower = message.lower()
+    if any(word in message_lower for word in ['payment', 'pay', 'card', 'balance', 'transaction', 'refund']):
+        return 'payment_agent'
+    elif any(word in message_lower for word in ['offer', 'discount', 'reward', 'promotion', 'deal', 'points']):
+        return 'offers_agent'
+    elif any(word in message_lower for word in ['schedule', 'bus', 'route', 'time', 'arrival', 'departure']):
+        return 'bus_schedule_agent'
+    return 'support_agent'
+
+
+def measure(route, iterations):
+    """Return (microseconds per message, accuracy) over the corpus"""
+    correct = sum(1 for message, expected in CORPUS if route(message) == expected)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for message, _ in CORPUS:
+            route(message)
+    elapsed = time.perf_counter() - started
+    return elapsed * 1e6 / (iterations * len(CORPUS)), correct / len(CORPUS)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark agent routing cost and accuracy")
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    with open(ROUTING_KEYWORDS_PATH) as f:
+        keywords = json.load(f)
+
+    # Disable memoization so every call pays the full scan, as a new message
+    # does; the memo only saves the second scan (tool selection) of a turn.
+    # The router also scores tools, so it costs more than the agent-only
+    # legacy scan: it was adopted for accuracy, not speed
+    router = KeywordRouter(keywords['agents'], keywords['tools'], cache_size=0)
+
+    results = [
+        ('legacy substring', legacy_route),
+        ('compiled regex', lambda message: router.route(message).agent_id),
+    ]
+    print(f"{'router':<28} | {'us/message':>10} | {'accuracy':>8}")
+    for name, route in results:
+        per_message_us, accuracy = measure(route, args.iterations)
+        print(f"{name:<28} | {per_message_us:>10.2f} | {accuracy:>8.1%}")
+
+    for name, route in results:
+        for message, expected in CORPUS:
+            if route(message) != expected:
+                print(f"  {name} misroute: {message!r} -> {route(message)} (expected {expected})")
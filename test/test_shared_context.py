@@ -0,0 +1,138 @@
+"""Tests for the Redis-backed shared context store
+
+Two SharedContextManager instances on one fakeredis server stand in for two
+app workers sharing a Redis instance:
+
+    python -m pytest test/test_shared_context.py
+"""
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+fakeredis = pytest.importorskip('fakeredis')
+
+from agent_utils.shared_context_manager import SharedContextManager
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def workers():
+    server = fakeredis.FakeServer()
+    managers = [
+        SharedContextManager(client=fakeredis.FakeRedis(server=server, decode_responses=True))
+        for _ in range(2)
+    ]
+    # The near-cache is only used once the invalidation listener is subscribed
+    assert all(_wait_for(lambda: manager._subscribed) for manager in managers)
+    yield managers
+    for manager in managers:
+        manager.close()
+
+
+def test_write_invalidates_other_workers_near_cache(workers):
+    first, second = workers
+    first.update_context('s1', 'language', 'en')
+    assert _wait_for(lambda: second.invalidations == 1)
+    assert second.get_context('s1') == {'language': 'en'}
+    assert second.memory_store.peek('s1') is not None
+
+    first.update_context('s1', 'language', 'fr')
+
+    assert _wait_for(lambda: second.memory_store.peek('s1') is None)
+    assert second.get_context('s1') == {'language': 'fr'}
+    assert second.get_cache_stats()['invalidations'] == 2
+
+
+def test_own_write_updates_near_cache_in_place(workers):
+    first, _ = workers
+    first.update_context('s1', 'language', 'en')
+    first.get_context('s1')
+
+    first.update_many('s1', {'language': 'fr'}, increments={'turns': 1})
+
+    assert first.memory_store.peek('s1').data == {'language': 'fr', 'turns': 1}
+
+
+def test_concurrent_increments_sum_exactly(workers):
+    per_thread = 25
+
+    def increment(manager):
+        for _ in range(per_thread):
+            manager.update_many('s1', {}, increments={'turns': 1})
+
+    threads = [threading.Thread(target=increment, args=(workers[i % 2],)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for manager in workers:
+        assert _wait_for(lambda: manager.get_context('s1').get('turns') == 6 * per_thread)
+
+
+def test_stale_expected_value_is_rejected(workers):
+    first, second = workers
+    first.update_context('s1', 'summary_upto', 10)
+    read = first.get_context('s1')['summary_upto']
+
+    second.update_many('s1', {'summary': 'newer', 'summary_upto': 20}, expected={'summary_upto': 10})
+
+    assert first.update_many('s1', {'summary': 'stale', 'summary_upto': 15}, expected={'summary_upto': read}) is False
+    assert first.update_many('s1', {'summary': 'fresh'}, expected={'missing': None}) is True
+    assert _wait_for(lambda: first.get_context('s1') == {'summary': 'fresh', 'summary_upto': 20})
+
+
+def test_contended_compare_and_set_loses_no_updates(workers):
+    per_thread = 10
+
+    def bump(manager):
+        for _ in range(per_thread):
+            # Read-modify-write; a lost race re-reads from the store and retries
+            while True:
+                manager.memory_store.pop('s1')
+                count = manager.get_context('s1').get('count')
+                if manager.update_many('s1', {'count': (count or 0) + 1}, expected={'count': count}):
+                    break
+
+    threads = [threading.Thread(target=bump, args=(workers[i % 2],)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    workers[0].memory_store.pop('s1')
+    assert workers[0].get_context('s1')['count'] == 4 * per_thread
+
+
+def test_batch_commits_once_on_exit(workers, monkeypatch):
+    first, second = workers
+    commits = []
+    commit = first._commit
+    monkeypatch.setattr(first, '_commit', lambda *args, **kwargs: commits.append(args) or commit(*args, **kwargs))
+
+    with first.batch():
+        first.update_context('s1', 'language', 'en')
+        first.update_many('s1', {'agent': 'payment_agent'}, increments={'turns': 1})
+        first.update_many('s1', {}, increments={'turns': 1})
+        first.update_context('s2', 'language', 'de')
+        first.clear_context_field('s1', 'language')
+        # Nothing reaches the store before the block exits
+        assert second.get_context('s1') == {}
+        assert commits == []
+
+    assert len(commits) == 1
+    assert _wait_for(lambda: second.get_context('s1') == {'agent': 'payment_agent', 'turns': 2})
+    assert second.get_context('s2') == {'language': 'de'}